@@ -1,15 +1,152 @@
 #!/usr/bin/env python3
 """This module contain declaration of a function, named hash_password"""
 import bcrypt
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
 
 
-def hash_password(password: str) -> bytes:
+HASH_WORKERS: int = int(os.getenv('BCRYPT_WORKERS', os.cpu_count() or 1))
+HASH_QUEUE_SIZE: int = int(os.getenv('BCRYPT_QUEUE_SIZE', 64))
+# bcrypt work factor: each extra round doubles the hashing time
+BCRYPT_ROUNDS: int = int(os.getenv('BCRYPT_ROUNDS', 12))
+MIN_ROUNDS: int = 4
+MAX_ROUNDS: int = 31
+
+
+class HashingExecutor:
+    """Thread pool dedicated to bcrypt, which releases the GIL while
+    hashing. At most queue_size calls wait for a free thread: past that,
+    submitting blocks the caller, so bursts apply backpressure instead of
+    piling up unbounded work"""
+
+    def __init__(self, workers: int = HASH_WORKERS,
+                 queue_size: int = HASH_QUEUE_SIZE):
+        """Initializes an instance of this class
+
+        Args:
+            workers - the number of hashing threads
+            queue_size - the number of calls allowed to wait for a thread
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn: Callable[..., Any], *args: Any,
+               timeout: Optional[float] = None) -> Future:
+        """Schedules fn(*args) on the pool
+
+        Args:
+            fn - the function to run, e.g. bcrypt.hashpw
+            args - the arguments of fn
+            timeout - how long to wait for room in the queue, in seconds
+
+        Returns:
+            a future of the result of fn
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Hashing queue is full")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Runs fn(*args) on the pool and waits for its result"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Runs fn(*args) on the pool and awaits its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+_hasher: Optional[HashingExecutor] = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher() -> HashingExecutor:
+    """Returns the hashing executor shared by the whole process"""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = HashingExecutor()
+        return _hasher
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> bytes:
     """Hashes a given password and returns its hashed salted version
 
+    Args:
+        password - the plain password to be hashed
+        rounds - the bcrypt work factor, BCRYPT_ROUNDS by default
+
     Returns:
         a salted, hashed version of the given password.
     """
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    return get_hasher().run(bcrypt.hashpw, password.encode(),
+                            bcrypt.gensalt(rounds or BCRYPT_ROUNDS))
+
+
+def hash_password_future(password: str,
+                         rounds: Optional[int] = None) -> Future:
+    """Hashes a given password on the shared hashing executor
+
+    Returns:
+        a future of the salted, hashed version of the given password.
+    """
+    return get_hasher().submit(bcrypt.hashpw, password.encode(),
+                               bcrypt.gensalt(rounds or BCRYPT_ROUNDS))
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """Returns the work factor a given bcrypt hash was computed with,
+    read from its "$2b$<rounds>$..." prefix"""
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode()
+    return int(hashed_password.split(b'$')[2])
+
+
+def needs_rehash(hashed_password: bytes,
+                 rounds: Optional[int] = None) -> bool:
+    """Checks whether a given hash was computed with another work factor
+    than the configured one, BCRYPT_ROUNDS by default"""
+    return hash_rounds(hashed_password) != (rounds or BCRYPT_ROUNDS)
+
+
+def calibrate_rounds(budget_ms: float, password: str = 'calibration',
+                     min_rounds: int = MIN_ROUNDS,
+                     max_rounds: int = MAX_ROUNDS) -> int:
+    """Finds the highest work factor whose hashing time fits in a given
+    latency budget on the current machine
+
+    Args:
+        budget_ms - the maximum time a hash may take, in milliseconds
+        password - the password hashed for the measures
+        min_rounds - the lowest acceptable work factor
+        max_rounds - the highest acceptable work factor
+
+    Returns:
+        the chosen work factor, never lower than min_rounds
+    """
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > budget_ms:
+            break
+        chosen = rounds
+        # the next round takes about twice as long: stop measuring
+        # as soon as it is bound to exceed the budget
+        if elapsed_ms * 2 > budget_ms:
+            break
+    return chosen
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
@@ -22,4 +159,17 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     Returns:
         True if the plain matches the hashed password, otherwise, False
     """
-    return bcrypt.checkpw(password.encode(), hashed_password)
+    return get_hasher().run(bcrypt.checkpw, password.encode(),
+                            hashed_password)
+
+
+def is_valid_future(hashed_password: bytes, password: str) -> Future:
+    """Compares a given hashed password and a plain password for validation
+    on the shared hashing executor
+
+    Returns:
+        a future of True if the plain matches the hashed password,
+        otherwise, of False
+    """
+    return get_hasher().submit(bcrypt.checkpw, password.encode(),
+                               hashed_password)
@@ -13,33 +13,70 @@ from typing import (
     Union,
     Optional,
     Any,
+    Pattern,
+    List,
+    Iterator,
+    Callable,
+    Iterable,
 )
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, islice
+from logging.handlers import QueueHandler, QueueListener
+import atexit
 import logging
+import queue
+import threading
 from datetime import datetime
 
 
 PII_FIELDS: Tuple[str, ...] = ('name', 'email', 'phone', 'ssn', 'password')
+EXPORT_BATCH_SIZE: int = int(os.getenv('PERSONAL_DATA_EXPORT_BATCH_SIZE',
+                                       1000))
+LOG_QUEUE_SIZE: int = int(os.getenv('PERSONAL_DATA_LOG_QUEUE_SIZE', 10000))
+LOG_OVERFLOW: str = os.getenv('PERSONAL_DATA_LOG_OVERFLOW', 'block')
+DB_POOL_SIZE: int = int(os.getenv('PERSONAL_DATA_DB_POOL_SIZE', 0))
+DB_POOL_TIMEOUT: float = float(os.getenv('PERSONAL_DATA_DB_POOL_TIMEOUT', 30))
+FILTER_CHUNK_SIZE: int = 10000
 
 
-def get_logger() -> logging.Logger:
+def get_logger(buffered: bool = False, queued: bool = False,
+               queue_size: int = LOG_QUEUE_SIZE,
+               overflow: str = LOG_OVERFLOW) -> logging.Logger:
     """Returns a logging.Logger object, which
-    creates and configures an handler for it"""
+    creates and configures an handler for it
+
+    Args:
+        buffered - if True, records are kept in memory and only written
+        to the stream, in a single write, when the handler is flushed
+        queued - if True, records are handed over to a background thread,
+        which redacts and writes them, through a bounded queue
+        queue_size - the maximum number of records waiting in the queue
+        overflow - what to do when the queue is full: 'block' the caller,
+        'drop_oldest' record in the queue, or 'drop' the new record;
+        dropped records are counted by the handler
+    """
     logger: logging.Logger = logging.getLogger('user_data')
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    stream_handler: logging.StreamHandler = logging.StreamHandler()
+    stream_handler: logging.StreamHandler = (
+        BufferedStreamHandler() if buffered else logging.StreamHandler())
     stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
-    logger.addHandler(stream_handler)
+    if not queued:
+        logger.addHandler(stream_handler)
+        return logger
+    record_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    listener = BlockingQueueListener(record_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(BoundedQueueHandler(record_queue, overflow))
     return logger
 
 
-def get_db() -> MySQLConnection:
-    """Connects to a database via an environment variable
-    and returns the connection
-
-    Returns:
-        a connection instance from the connection pool
-    """
+def connect_db() -> MySQLConnection:
+    """Opens a new connection to the database
+    described by the environment variables"""
     return connect(
                    host=os.getenv('PERSONAL_DATA_DB_HOST'),
                    user=os.getenv('PERSONAL_DATA_DB_USERNAME'),
@@ -48,6 +85,151 @@ def get_db() -> MySQLConnection:
     )
 
 
+def get_db() -> MySQLConnection:
+    """Connects to a database via an environment variable
+    and returns the connection
+
+    Returns:
+        a connection instance from the connection pool, if
+        PERSONAL_DATA_DB_POOL_SIZE is set (or DB_POOL is assigned),
+        otherwise a new connection
+    """
+    global DB_POOL
+    if DB_POOL is None:
+        if DB_POOL_SIZE <= 0:
+            return connect_db()
+        DB_POOL = ConnectionPool(connect_db, DB_POOL_SIZE)
+    return DB_POOL.get_connection(timeout=DB_POOL_TIMEOUT)
+
+
+class PooledConnection:
+    """Proxy of a connection checked out from a ConnectionPool,
+    whose close() hands the connection back to the pool"""
+
+    def __init__(self, pool: 'ConnectionPool', conn: Any):
+        """Initializes an instance of this class"""
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        """delegates everything else to the actual connection"""
+        return getattr(self._conn, name)
+
+    def close(self) -> None:
+        """returns the connection to the pool"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+
+class ConnectionPool:
+    """Fixed-size pool of database connections.
+
+    Connections are opened lazily through a given factory (connect_db,
+    or e.g. a sqlite3.connect stand-in), and checked with a ping or a
+    trivial query on checkout, a dead one being replaced by a new one.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int):
+        """Initializes an instance of this class
+
+        Args:
+            factory - a callable returning a new connection
+            size - the maximum number of connections open at once
+        """
+        self.factory = factory
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @staticmethod
+    def is_alive(conn: Any) -> bool:
+        """Checks that a given connection still works"""
+        try:
+            if hasattr(conn, 'ping'):
+                conn.ping()
+            else:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.fetchall()
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def get_connection(self,
+                       timeout: Optional[float] = None) -> PooledConnection:
+        """Checks a healthy connection out of the pool
+
+        Args:
+            timeout - how long to wait for a free connection, in seconds
+
+        Returns:
+            a connection, to be handed back by calling its close() method
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No connection available in the pool")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+                if not self.is_alive(conn):
+                    self._close(conn)
+                    conn = self.factory()
+            except queue.Empty:
+                conn = self.factory()
+        except Exception:
+            self._slots.release()
+            raise
+        return PooledConnection(self, conn)
+
+    def release(self, conn: Any) -> None:
+        """Puts a checked out connection back in the pool"""
+        self._idle.put(conn)
+        self._slots.release()
+
+    @staticmethod
+    def _close(conn: Any) -> None:
+        """Closes a connection, ignoring any error"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """Closes all the idle connections of the pool"""
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+DB_POOL: Optional[ConnectionPool] = None
+
+
+@lru_cache(maxsize=None)
+def compile_redaction(fields: Tuple[str, ...],
+                      separator: str) -> Pattern[str]:
+    """Compiles a single pattern matching the value of any of the given
+    fields, so that a log line is redacted in one pass
+
+    Args:
+        fields - a tuple of strings representing all fields to obfuscate
+        separator - a string representing a character, separating all fields
+
+    Returns:
+        the compiled pattern, whose first group is the field's name
+    """
+    names = '|'.join(re.escape(f) for f in fields)
+    return re.compile(r'({})=.+?(?={})'.format(names, re.escape(separator)))
+
+
+def redaction_template(redaction: str) -> str:
+    """Returns the replacement template, which keeps the field's name
+    and substitutes its value with the given redaction"""
+    return r'\1=' + redaction.replace('\\', r'\\')
+
+
 def filter_datum(fields: Tuple[str, ...], redaction: str,
                  message: str, seperator: str) -> str:
     """Obfuscates a given message, based on a given fields
@@ -61,10 +243,76 @@ def filter_datum(fields: Tuple[str, ...], redaction: str,
     Returns:
         returns an obfuscated version of the passed message
     """
-    for f in fields:
-        message = re.sub(rf'{f}=.+?(?={seperator})',
-                         rf'{f}={redaction}', message)
-    return message
+    if len(fields) == 0:
+        return message
+    pattern = compile_redaction(tuple(fields), seperator)
+    return pattern.sub(redaction_template(redaction), message)
+
+
+def _filter_chunk(fields: Tuple[str, ...], redaction: str,
+                  messages: List[str], separator: str) -> List[str]:
+    """Obfuscates a chunk of messages; runs in the worker processes"""
+    if len(fields) == 0:
+        return messages
+    pattern = compile_redaction(fields, separator)
+    template = redaction_template(redaction)
+    return [pattern.sub(template, message) for message in messages]
+
+
+def _chunked(messages: Iterable[str],
+             chunk_size: int) -> Iterator[List[str]]:
+    """Splits an iterable of messages into lists of chunk_size messages"""
+    messages = iter(messages)
+    while True:
+        chunk = list(islice(messages, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def filter_data(fields: Tuple[str, ...], redaction: str,
+                messages: Iterable[str], separator: str,
+                chunk_size: int = FILTER_CHUNK_SIZE,
+                workers: Optional[int] = None) -> Iterator[str]:
+    """Obfuscates a stream of messages, based on a given fields.
+    Input that spans more than one chunk is redacted by a pool of
+    processes, with a bounded number of chunks in flight, so that
+    neither the input nor the output is ever held in memory as a whole
+
+    Args:
+        fields - a list of strings representing all fields to obfuscate
+        redaction - a string representing by what the field will be obfuscated
+        messages - an iterable of log lines, e.g. an open file
+        separator - a string representing a character, separating all fields
+        chunk_size - the number of messages sent to a process at once
+        workers - the number of processes, the number of CPUs by default
+
+    Returns:
+        a generator of the obfuscated messages, in the input order
+    """
+    fields = tuple(fields)
+    chunks = _chunked(messages, chunk_size)
+    first = next(chunks, None)
+    second = next(chunks, None)
+    if second is None or workers == 1:
+        for chunk in chain(filter(None, (first, second)), chunks):
+            yield from _filter_chunk(fields, redaction, chunk, separator)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    max_pending = 2 * workers
+    pending: deque = deque()
+    try:
+        for chunk in chain((first, second), chunks):
+            pending.append(executor.submit(_filter_chunk, fields,
+                                           redaction, chunk, separator))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -80,29 +328,153 @@ class RedactingFormatter(logging.Formatter):
         """Initializes an instance of this class"""
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.FIELDS = fields
+        self._pattern = compile_redaction(tuple(fields), self.SEPARATOR)
+        self._template = redaction_template(self.REDACTION)
 
     def format(self, record: logging.LogRecord) -> str:
         """formats a given record, based on the fields, and other factors"""
-        record.msg = filter_datum(self.FIELDS, self.REDACTION,
-                                  record.getMessage(), self.SEPARATOR)
+        message = record.getMessage()
+        if len(self.FIELDS) > 0:
+            message = self._pattern.sub(self._template, message)
+        record.msg = message
+        record.args = None
         return super(RedactingFormatter, self).format(record)
 
 
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that keeps the formatted records in memory and
+    writes them all at once when flushed, instead of once per record"""
+
+    def __init__(self, stream: Optional[Any] = None):
+        """Initializes an instance of this class"""
+        super(BufferedStreamHandler, self).__init__(stream)
+        self.lines: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """formats a given record and buffers it"""
+        try:
+            self.lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """writes the buffered records to the stream and flushes it"""
+        self.acquire()
+        try:
+            if self.lines:
+                self.stream.write(self.terminator.join(self.lines) +
+                                  self.terminator)
+                self.lines = []
+            super(BufferedStreamHandler, self).flush()
+        finally:
+            self.release()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue, which applies an overflow
+    policy when the queue is full and counts the records it drops"""
+
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop')
+
+    def __init__(self, record_queue: queue.Queue, overflow: str = 'block'):
+        """Initializes an instance of this class"""
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy {}".format(overflow))
+        super(BoundedQueueHandler, self).__init__(record_queue)
+        self.overflow = overflow
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def _count_dropped(self) -> None:
+        """increments the number of dropped records"""
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """leaves the record untouched: merging its arguments and
+        redacting it is the listener's formatter job"""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """puts a given record in the queue, according to the policy"""
+        if self.overflow == 'block':
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                if self.overflow == 'drop':
+                    self._count_dropped()
+                    return
+            try:
+                self.queue.get_nowait()
+                self._count_dropped()
+            except queue.Empty:
+                pass
+
+
+class BlockingQueueListener(QueueListener):
+    """QueueListener that waits for room in a bounded queue to enqueue
+    its stop sentinel, instead of failing when the queue is full"""
+
+    def enqueue_sentinel(self) -> None:
+        """puts the stop sentinel in the queue"""
+        self.queue.put(self._sentinel)
+
+
+def format_user_row(rec: Sequence[Any]) -> str:
+    """Builds the log line of a given row of the users table"""
+    td: Union[datetime, Any] = rec[6]
+    td_str: str = td.strftime("%Y-%m-%d %H:%M:%S")
+    log_msg = (f'name={rec[0]};', f'email={rec[1]};', f'phone={rec[2]};',
+               f'ssn={rec[3]};', f'password={rec[4]};', f'ip={rec[5]};',
+               'last_login={};'.format(td_str),
+               f'user_agent={rec[7]};')
+    return ' '.join(log_msg)
+
+
+def fetch_batches(cursor: MySQLCursor,
+                  batch_size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """Yields the rows of an executed query, batch_size rows at a time"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def export_users(db: MySQLConnection, logger: logging.Logger,
+                 batch_size: int = EXPORT_BATCH_SIZE) -> None:
+    """Logs every row of the users table, streaming them from the server
+    batch by batch, so that memory stays bounded by batch_size
+
+    Args:
+        db - an open connection to the database
+        logger - the logger the rows are written to
+        batch_size - the number of rows fetched and logged at once
+    """
+    # an unbuffered cursor reads the rows from the server as they are
+    # fetched, rather than loading the whole result set client side
+    cursor: MySQLCursor = db.cursor(buffered=False)
+    try:
+        cursor.execute('SELECT * FROM users;')
+        for rows in fetch_batches(cursor, batch_size):
+            lines = [format_user_row(rec) for rec in rows]
+            for line in lines:
+                logger.log(level=logger.level, msg=line)
+            for handler in logger.handlers:
+                handler.flush()
+    finally:
+        cursor.close()
+
+
 def main() -> None:
     """Main entrance to the program. Executes the program from this point"""
     db: MySQLConnection = get_db()
-    logger: logging.Logger = get_logger()
-    cursor: MySQLCursor = db.cursor()
-    cursor.execute('SELECT * FROM users;')
-    for rec in cursor:
-        td: Union[datetime, Any] = rec[6]
-        td_str: str = td.strftime("%Y-%m-%d %H:%M:%S")
-        log_msg = (f'name={rec[0]};', f'email={rec[1]};', f'phone={rec[2]};',
-                   f'ssn={rec[3]};', f'password={rec[4]};', f'ip={rec[5]};',
-                   'last_login={};'.format(td_str),
-                   f'user_agent={rec[7]};')
-        logger.log(level=logger.level, msg=' '.join(log_msg))
-    cursor.close()
+    logger: logging.Logger = get_logger(buffered=True)
+    export_users(db, logger)
     db.close()
 
 
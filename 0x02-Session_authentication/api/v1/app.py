@@ -4,15 +4,44 @@ Route module for the API
 """
 from os import getenv
 from api.v1.views import app_views
-from flask import Flask, jsonify, abort, request
+from flask import Flask, jsonify, abort, request, Request
 from flask_cors import (CORS, cross_origin)
+from time import perf_counter
 import os
 
 
+class AuthenticatedRequest(Request):
+    """Request whose current user is resolved lazily, at most once:
+    only when the path requires authentication or a view reads it"""
+
+    _current_user_resolved = False
+    _current_user = None
+    auth_duration = None
+
+    @property
+    def current_user(self):
+        """The authenticated user of the request, or None"""
+        if not self._current_user_resolved:
+            start = perf_counter()
+            if auth is not None:
+                self._current_user = auth.current_user(request=self)
+            self.auth_duration = perf_counter() - start
+            self._current_user_resolved = True
+        return self._current_user
+
+    @current_user.setter
+    def current_user(self, user):
+        """Sets the authenticated user of the request"""
+        self._current_user = user
+        self._current_user_resolved = True
+
+
 app = Flask(__name__)
+app.request_class = AuthenticatedRequest
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
+excluded_paths = None
 
 
 if getenv('AUTH_TYPE') == "basic_auth":
@@ -30,23 +59,39 @@ elif getenv('AUTH_TYPE') == "session_exp_auth":
 elif getenv('AUTH_TYPE') == "session_db_auth":
     from api.v1.auth.session_db_auth import SessionDBAuth
     auth = SessionDBAuth()
+elif getenv('AUTH_TYPE') == "signed_session_auth":
+    from api.v1.auth.signed_session_auth import SignedSessionAuth
+    auth = SignedSessionAuth()
+
+if auth is not None:
+    from api.v1.auth.auth import PathMatcher
+    excluded_paths = PathMatcher(['/api/v1/status/',
+                                  '/api/v1/unauthorized/',
+                                  '/api/v1/forbidden/',
+                                  '/api/v1/auth_session/login/'])
 
 
 @app.before_request
 def before_request():
     """Handles the authentication aspect to secure some resources"""
-    request.current_user = auth.current_user(request=request)
-    if auth is not None:
-        excluded_paths = ['/api/v1/status/',
-                          '/api/v1/unauthorized/',
-                          '/api/v1/forbidden/',
-                          '/api/v1/auth_session/login/',]
-        if auth.require_auth(request.path, excluded_paths):
-            if (auth.authorization_header(request) is None and
-               auth.session_cookie(request) is None):
-                abort(401)
-            if auth.current_user(request) is None:
-                abort(403)
+    if auth is None:
+        return
+    if not auth.require_auth(request.path, excluded_paths):
+        return
+    if (auth.authorization_header(request) is None and
+       auth.session_cookie(request) is None):
+        abort(401)
+    if request.current_user is None:
+        abort(403)
+
+
+@app.after_request
+def after_request(response):
+    """Reports the time spent authenticating the request, if any"""
+    if request.auth_duration is not None:
+        response.headers.add('Server-Timing', 'auth;dur={:.3f}'.format(
+            request.auth_duration * 1000))
+    return response
 
 
 @app.errorhandler(404)
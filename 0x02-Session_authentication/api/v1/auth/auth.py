@@ -2,68 +2,98 @@
 """Module houses the definition of an Authentication class"""
 
 from flask import request
+from functools import lru_cache
 from typing import (
     List,
-    TypeVar
+    Tuple,
+    TypeVar,
+    Union
 )
 from os import getenv
 
 
-def match_wildcard(path: str, specific_path: str) -> bool:
-    """Manages wildcard character in exlcuded path list
+class PathMatcher:
+    """Matches paths against a list of excluded paths, compiled once.
 
-    Args:
-        path - the path that is to be validated
-        specific_path - a path among paths in excluded paths list
-
-    Returns:
-        True if the widcard does not include path, otherwise False
+    A path ending with '*' excludes every path it prefixes, and is stored
+    in a character trie; any other path excludes itself with or without
+    a trailing slash, and is stored in a set. Matching a path therefore
+    takes O(len(path)), whatever the number of excluded paths.
     """
-    splitted_path = specific_path.split('/')
-    for i in range(1, 3):
-        if splitted_path[i] not in path:
+
+    _END = ''
+
+    def __init__(self, excluded_paths: List[str]):
+        """Compiles a given list of excluded paths
+
+        Args:
+            excluded_paths - list of excluded resources' uris
+        """
+        self.exact = set()
+        self.prefixes = {}
+        for p in excluded_paths:
+            if p.endswith('*'):
+                node = self.prefixes
+                for c in p[:-1]:
+                    node = node.setdefault(c, {})
+                node[self._END] = True
+            else:
+                self.exact.add(self._normalize(p))
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        """Strips the trailing slash of a given path"""
+        if len(path) > 1 and path.endswith('/'):
+            return path[:-1]
+        return path
+
+    def match(self, path: str) -> bool:
+        """Checks if a given path is excluded
+
+        Args:
+            path - a resource uri to be checked
+
+        Returns:
+            True if the path is excluded, otherwise False
+        """
+        if self._normalize(path) in self.exact:
             return True
-    len_main_dir = len(splitted_path[-1])
-    if splitted_path[-1][:len_main_dir - 1] not in path:
-        return True
-    return False
+        node = self.prefixes
+        for c in path:
+            if self._END in node:
+                return True
+            node = node.get(c)
+            if node is None:
+                return False
+        return self._END in node
+
+
+@lru_cache(maxsize=32)
+def compile_excluded_paths(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """Returns the matcher of a given tuple of excluded paths,
+    compiling it only the first time"""
+    return PathMatcher(list(excluded_paths))
 
 
 class Auth:
     """Manages the authentication aspect of the API"""
 
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], PathMatcher]) -> bool:
         """Checkes if a resource requires authentication via its url
         Args:
             path - a resource uri to be checked
-            excluded_paths - list of excluded resources' uris
+            excluded_paths - list of excluded resources' uris, or
+            its PathMatcher, compiled beforehand
 
         Returns:
             False, if a uri is excluded in the exclusion list, otherwise True
         """
-        if (not path) or (not excluded_paths) or (len(excluded_paths) == 0):
-            return True
-        if path.endswith('/'):
-            for p in excluded_paths:
-                if p.endswith('*'):
-                    return match_wildcard(path, p)
-                if not p.endswith('/'):
-                    p = p + '/'
-                if path == p:
-                    return False
+        if (not path) or (not excluded_paths):
             return True
-        for p in excluded_paths:
-            p_path = path
-            if p.endswith('/'):
-                if not p_path.endswith('/'):
-                    p_path = path + '/'
-                if p == p_path:
-                    return False
-            if p.endswith('*'):
-                return match_wildcard(path, p)
-            if p_path == p:
-                return False
-        return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_excluded_paths(tuple(excluded_paths))
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """Managest the authorization header
@@ -3,14 +3,86 @@
 
 from api.v1.auth.auth import Auth
 from base64 import standard_b64decode
+from collections import OrderedDict
 from models.user import User
+from os import getenv
 from typing import TypeVar
 from api.v1.auth.auth import Auth
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+class CredentialCache:
+    """Bounded LRU cache, with a time to live, of the Authorization
+    headers that were already verified.
+
+    Headers are keyed by their HMAC under a per-process random key, so
+    the raw credentials are never kept in memory. Each entry remembers
+    the email and password hash it was verified against: an entry whose
+    user was removed, or saved with another email or password since, is
+    dropped on lookup.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        """Initializes an instance of this class
+
+        Args:
+            max_size - the maximum number of cached headers
+            ttl - how long a verified header is trusted, in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, authorization_header: str) -> bytes:
+        """Returns the keyed hash of a given header"""
+        return hmac.new(self._key, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """Returns the user a given header was verified for,
+        or None if it is unknown, expired or stale"""
+        digest = self._digest(authorization_header)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            user_id, email, password, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+        user = User.get(user_id)
+        if user is None or user.email != email or user.password != password:
+            with self._lock:
+                self._entries.pop(digest, None)
+            return None
+        return user
+
+    def set(self, authorization_header: str, user: TypeVar('User')):
+        """Caches a given header as verified for a given user"""
+        digest = self._digest(authorization_header)
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
 
 
 class BasicAuth(Auth):
     """Handles basic authentication scheme"""
 
+    credential_cache = CredentialCache(
+        int(getenv("BASIC_AUTH_CACHE_SIZE", 1024)),
+        float(getenv("BASIC_AUTH_CACHE_TTL", 300)))
+
     def extract_base64_authorization_header(self,
                                             authorization_header: str) -> str:
         """Extracts the base 64 part of an authorization header
@@ -117,7 +189,15 @@ class BasicAuth(Auth):
         """
         auth = Auth()
         auth_header = auth.authorization_header(request=request)
+        if auth_header is None:
+            return None
+        user = self.credential_cache.get(auth_header)
+        if user is not None:
+            return user
         auth_b64 = self.extract_base64_authorization_header(auth_header)
         b64_decoded_val = self.decode_base64_authorization_header(auth_b64)
         user_cred = self.extract_user_credentials(b64_decoded_val)
-        return self.user_object_from_credentials(*user_cred)
+        user = self.user_object_from_credentials(*user_cred)
+        if user is not None:
+            self.credential_cache.set(auth_header, user)
+        return user
@@ -2,6 +2,7 @@
 """This modules houses the definition for the Session Authentication"""
 
 from .auth import Auth
+from .session_store import create_session_store
 from models.user import User
 import uuid
 
@@ -9,7 +10,17 @@ import uuid
 class SessionAuth(Auth):
     """Manages session authentication type"""
 
-    user_id_by_session_id = {}
+    # lifetime of the sessions in seconds, 0 for sessions that never expire
+    session_duration = 0
+    # False for subclasses that keep their sessions elsewhere
+    uses_session_store = True
+
+    def __init__(self):
+        """Initializes an instance of this class, with the
+        session store selected by the SESSION_STORE variable"""
+        self.session_store = None
+        if self.uses_session_store:
+            self.session_store = create_session_store()
 
     def create_session(self, user_id: str = None) -> str:
         """creates a Session ID for a given user_id
@@ -24,7 +35,7 @@ class SessionAuth(Auth):
         if ((user_id is None) or (not isinstance(user_id, str))):
             return None
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        self.session_store.set(session_id, user_id, self.session_duration)
         return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> str:
@@ -40,7 +51,7 @@ class SessionAuth(Auth):
         """
         if (session_id is None) or not (type(session_id) is str):
             return None
-        return self.user_id_by_session_id.get(session_id)
+        return self.session_store.get(session_id)
 
     def current_user(self, request=None):
         """Retrieves a user's instance based
@@ -77,5 +88,4 @@ class SessionAuth(Auth):
         user_id = self.user_id_for_session_id(session_id)
         if user_id is None:
             return False
-        del self.user_id_by_session_id[session_id]
-        return True
+        return self.session_store.delete(session_id)
@@ -1,21 +1,28 @@
 #!/usr/bin/env python3
 """This module houses the implementation of a class, named SessionDBAuth"""
 from .session_exp_auth import SessionExpAuth
-from models.user_session import (
-    UserSession,
-    TIMESTAMP_FORMAT
-)
+from models.user_session import UserSession
 from models.user import User
-from uuid import uuid4
-from datetime import (
-    datetime,
-    timedelta
-)
+from datetime import timezone
+from os import getenv
+import threading
+import time
 
 
 class SessionDBAuth(SessionExpAuth):
     """Manages the session data in a database"""
 
+    # the sessions are UserSession objects, not entries of a session store
+    uses_session_store = False
+
+    def __init__(self):
+        """Initializes an instance of this class, and starts purging the
+        expired sessions every SESSION_PURGE_INTERVAL seconds"""
+        super().__init__()
+        self.purge_interval = float(getenv("SESSION_PURGE_INTERVAL", 300))
+        if self.session_duration > 0 and self.purge_interval > 0:
+            threading.Thread(target=self._purge_forever, daemon=True).start()
+
     def create_session(self, user_id=None):
         """Creates a session data for a typical current user and stores it
 
@@ -29,13 +36,14 @@ class SessionDBAuth(SessionExpAuth):
             return None
         if not isinstance(user_id, str):
             return None
-        if len(User.search({"id": user_id})) == 0:
+        if User.get(user_id) is None:
             return None
-        # session_id = str(uuid4())
 
         user_session = UserSession()
         user_session.user_id = user_id
         user_session.session_id = user_session.id
+        if self.session_duration > 0:
+            user_session.expires_at = time.time() + self.session_duration
         user_session.save()
         return user_session.id
 
@@ -52,36 +60,67 @@ class SessionDBAuth(SessionExpAuth):
         """
         if session_id is None or (not isinstance(session_id, str)):
             return None
-        if UserSession.count() == 0:
+        # the session ID is the ID of its UserSession
+        user_session = UserSession.get(session_id)
+        if user_session is None:
             return None
-        session_obj_list = UserSession.search({"id": session_id})
-        if len(session_obj_list) != 1:
+        if self.is_expired(user_session, time.time()):
             return None
-        session_dur = session_obj_list[0].to_json().get("created_at")
-        session_dur = datetime.strptime(session_dur, TIMESTAMP_FORMAT)
-        session_dur += timedelta(seconds=self.session_duration)
-        current_t = datetime.utcnow()
-        if session_dur < current_t:
-            return None
-        return session_obj_list[0].to_json().get("user_id")
-    
+        return user_session.user_id
+
+    def is_expired(self, user_session: UserSession, now: float) -> bool:
+        """Checks if a given session is expired at a given time
+
+        Args:
+            user_session - the session to check
+            now - the current POSIX timestamp
+        """
+        if self.session_duration <= 0:
+            return False
+        expires_at = user_session.expires_at
+        if expires_at is None:
+            # sessions stored before expires_at existed
+            created_at = user_session.created_at.replace(tzinfo=timezone.utc)
+            expires_at = created_at.timestamp() + self.session_duration
+        return expires_at < now
+
+    def purge_expired_sessions(self) -> int:
+        """Removes every expired UserSession, in a single write
+
+        Returns:
+            the number of removed sessions
+        """
+        now = time.time()
+        expired = [s for s in UserSession.all() if self.is_expired(s, now)]
+        if len(expired) == 0:
+            return 0
+        return UserSession.remove_all(expired)
+
+    def _purge_forever(self):
+        """Purges the expired sessions every purge_interval seconds"""
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                self.purge_expired_sessions()
+            except Exception:
+                pass
+
     def destroy_session(self, request=None):
         """Destroys the UserSession based on the
         Session ID from the request cookie
-        
+
         Args:
             request - the request object that contains
-            the session id for the session to be destroyed 
+            the session id for the session to be destroyed
         """
         if request is None:
             return False
         session_id = self.session_cookie(request)
         if session_id is None:
             return False
-        user_id = self.user_id_for_session_id(session_id)
-        if user_id is None:
+        if self.user_id_for_session_id(session_id) is None:
             return False
-        user_session_obj = UserSession.get(user_id)
+        user_session_obj = UserSession.get(session_id)
         try:
             user_session_obj.remove()
         except Exception:
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""This module houses the implementation of the stores of sessions:
+MemorySessionStore, in the memory of the process, and
+SQLiteSessionStore, shared by every process of a host"""
+from collections import OrderedDict
+from models.storage import thread_connection
+from os import getenv
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Tuple,
+    Union
+)
+import heapq
+import sqlite3
+import sys
+import threading
+import time
+
+
+class SessionStore:
+    """Interface of a session store, mapping session IDs to user IDs
+    with an optional time to live"""
+
+    def set(self, session_id: str, user_id: str, ttl: float = 0) -> None:
+        """Stores a session, for ttl seconds if ttl > 0"""
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """Returns the user ID of a live session, or None"""
+        raise NotImplementedError
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, str]:
+        """Returns a dictionary mapping the ID of each live session
+        among session_ids to its user ID"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session, and returns whether it existed"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """Returns the number of stored sessions"""
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Deletes every expired session, and returns how many were"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Returns figures about the store and its size"""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Maps session IDs to user IDs, with an optional time to live.
+
+    Lookups, inserts and deletes are O(1) on an OrderedDict kept in least
+    recently used order. Deadlines sit in a min-heap, so expired sessions
+    are evicted in O(log n) each, by the lookups that meet them or by a
+    background sweeper, instead of staying in memory forever. When a
+    maximum number of sessions is set, inserting past it evicts the least
+    recently used session.
+    """
+
+    def __init__(self, max_sessions: int = 0, sweep_interval: float = 60):
+        """Initializes an instance of this class
+
+        Args:
+            max_sessions - the maximum number of sessions kept, 0 for
+            no maximum
+            sweep_interval - the number of seconds between two sweeps of
+            the expired sessions, 0 to only evict them on lookup
+        """
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self._sessions: OrderedDict = OrderedDict()
+        self._deadlines: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._sweeper: Union[threading.Thread, None] = None
+        self.expired = 0
+        self.evicted = 0
+
+    def set(self, session_id: str, user_id: str, ttl: float = 0) -> None:
+        """Stores a session
+
+        Args:
+            session_id - the ID of the session
+            user_id - the ID of the user the session belongs to
+            ttl - the lifetime of the session in seconds, 0 for no expiry
+        """
+        expires_at = time.monotonic() + ttl if ttl > 0 else None
+        with self._lock:
+            self._sessions[session_id] = (user_id, expires_at)
+            self._sessions.move_to_end(session_id)
+            if expires_at is not None:
+                heapq.heappush(self._deadlines, (expires_at, session_id))
+            while 0 < self.max_sessions < len(self._sessions):
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+            self._compact()
+        if expires_at is not None:
+            self._start_sweeper()
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """Retrieves the user ID of a live session
+
+        Args:
+            session_id - the ID of the session
+
+        Returns:
+            the user ID, or None if the session is unknown or expired
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            user_id, expires_at = session
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            return user_id
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, str]:
+        """Retrieves the user IDs of many sessions at once
+
+        Args:
+            session_ids - the IDs of the sessions
+
+        Returns:
+            a dictionary mapping the ID of each live session to its user ID
+        """
+        result = {}
+        for session_id in session_ids:
+            user_id = self.get(session_id)
+            if user_id is not None:
+                result[session_id] = user_id
+        return result
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session
+
+        Args:
+            session_id - the ID of the session
+
+        Returns:
+            True if the session existed, otherwise False
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        """Returns the number of stored sessions"""
+        return len(self._sessions)
+
+    def sweep(self) -> int:
+        """Evicts every expired session
+
+        Returns:
+            the number of evicted sessions
+        """
+        count = 0
+        now = time.monotonic()
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                expires_at, session_id = heapq.heappop(self._deadlines)
+                session = self._sessions.get(session_id)
+                # the heap keeps stale deadlines of sessions that were
+                # deleted or renewed since: only evict the current one
+                if session is not None and session[1] == expires_at:
+                    del self._sessions[session_id]
+                    count += 1
+            self.expired += count
+        return count
+
+    def _compact(self) -> None:
+        """Rebuilds the heap once stale deadlines outnumber live sessions;
+        must be called with the lock held"""
+        if len(self._deadlines) <= 2 * len(self._sessions) + 64:
+            return
+        self._deadlines = [(s[1], sid) for sid, s in self._sessions.items()
+                           if s[1] is not None]
+        heapq.heapify(self._deadlines)
+
+    def _start_sweeper(self) -> None:
+        """Starts the background sweeper, if needed and not started yet"""
+        if self.sweep_interval <= 0 or self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever,
+                                             daemon=True)
+        self._sweeper.start()
+
+    def _sweep_forever(self) -> None:
+        """Sweeps the expired sessions every sweep_interval seconds"""
+        while True:
+            time.sleep(self.sweep_interval)
+            self.sweep()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns figures about the store and its memory usage
+
+        Returns:
+            a dictionary of the number of live sessions, of deadlines in
+            the heap, of sessions expired or evicted so far, and of the
+            approximate size of the store in bytes
+        """
+        with self._lock:
+            size = sys.getsizeof(self._sessions) + \
+                sys.getsizeof(self._deadlines)
+            for session_id, session in self._sessions.items():
+                size += sys.getsizeof(session_id) + sys.getsizeof(session)
+            return {
+                "sessions": len(self._sessions),
+                "deadlines": len(self._deadlines),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "bytes": size
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store kept in a SQLite database in WAL mode, so that every
+    worker process of a host sees the sessions created by the others.
+
+    Deadlines are POSIX
+    timestamps, indexed so that sweeping the expired sessions is a single
+    range delete; get_many() resolves many sessions in one query.
+    """
+
+    def __init__(self, file_path: str, sweep_interval: float = 60):
+        """Initializes an instance of this class
+
+        Args:
+            file_path - path of the SQLite database file
+            sweep_interval - the number of seconds between two sweeps of
+            the expired sessions, 0 to never sweep them
+        """
+        self.file_path = file_path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._sweeper: Union[threading.Thread, None] = None
+        self._sweeper_lock = threading.Lock()
+        conn = self._conn
+        conn.execute('CREATE TABLE IF NOT EXISTS sessions '
+                     '(session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, '
+                     'expires_at REAL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires_at '
+                     'ON sessions (expires_at)')
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Connection of the current thread, opened on first use"""
+        return thread_connection(self._local, self.file_path)
+
+    def set(self, session_id: str, user_id: str, ttl: float = 0) -> None:
+        """Stores a session
+
+        Args:
+            session_id - the ID of the session
+            user_id - the ID of the user the session belongs to
+            ttl - the lifetime of the session in seconds, 0 for no expiry
+        """
+        expires_at = time.time() + ttl if ttl > 0 else None
+        self._conn.execute('INSERT OR REPLACE INTO sessions '
+                           '(session_id, user_id, expires_at) '
+                           'VALUES (?, ?, ?)',
+                           (session_id, user_id, expires_at))
+        if expires_at is not None:
+            self._start_sweeper()
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """Retrieves the user ID of a live session
+
+        Args:
+            session_id - the ID of the session
+
+        Returns:
+            the user ID, or None if the session is unknown or expired
+        """
+        return self.get_many([session_id]).get(session_id)
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, str]:
+        """Retrieves the user IDs of many sessions in a single query
+
+        Args:
+            session_ids - the IDs of the sessions
+
+        Returns:
+            a dictionary mapping the ID of each live session to its user ID
+        """
+        session_ids = list(session_ids)
+        now = time.time()
+        result = {}
+        # stay under SQLite's limit of bound parameters per statement
+        for i in range(0, len(session_ids), 500):
+            chunk = session_ids[i:i + 500]
+            rows = self._conn.execute(
+                'SELECT session_id, user_id FROM sessions '
+                'WHERE session_id IN ({}) '
+                'AND (expires_at IS NULL OR expires_at > ?)'
+                .format(', '.join('?' * len(chunk))),
+                chunk + [now])
+            result.update(rows)
+        return result
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session
+
+        Args:
+            session_id - the ID of the session
+
+        Returns:
+            True if the session existed, otherwise False
+        """
+        cursor = self._conn.execute(
+            'DELETE FROM sessions WHERE session_id = ?', (session_id,))
+        return cursor.rowcount > 0
+
+    def __len__(self) -> int:
+        """Returns the number of stored sessions"""
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def sweep(self) -> int:
+        """Deletes every expired session
+
+        Returns:
+            the number of deleted sessions
+        """
+        cursor = self._conn.execute(
+            'DELETE FROM sessions WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
+
+    def _start_sweeper(self) -> None:
+        """Starts the background sweeper, if needed and not started yet"""
+        if self.sweep_interval <= 0 or self._sweeper is not None:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever,
+                                             daemon=True)
+        self._sweeper.start()
+
+    def _sweep_forever(self) -> None:
+        """Sweeps the expired sessions every sweep_interval seconds"""
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        """Returns figures about the store and its size
+
+        Returns:
+            a dictionary of the number of stored sessions, and of the
+            size of the database file in bytes
+        """
+        conn = self._conn
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        return {
+            "sessions": len(self),
+            "bytes": page_count * page_size
+        }
+
+
+def create_session_store() -> SessionStore:
+    """Creates the session store selected by the SESSION_STORE variable:
+    "sqlite" for a store shared by the processes of the host, at
+    SESSION_STORE_PATH, or the in-memory store of the process otherwise
+
+    Returns:
+        the created session store
+    """
+    sweep_interval = float(getenv("SESSION_SWEEP_INTERVAL", 60))
+    if getenv("SESSION_STORE") == "sqlite":
+        return SQLiteSessionStore(
+            getenv("SESSION_STORE_PATH", ".db_sessions.sqlite3"),
+            sweep_interval=sweep_interval)
+    return MemorySessionStore(
+        max_sessions=int(getenv("SESSION_MAX_COUNT", 0)),
+        sweep_interval=sweep_interval)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""This module houses the implementation of a class, named
+SignedSessionAuth, whose sessions need no store to be verified"""
+from .session_auth import SessionAuth
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from models.storage import thread_connection
+from os import getenv
+from typing import List, Tuple, Union
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+
+
+def _b64encode(data: bytes) -> str:
+    """Encodes bytes in unpadded, URL-safe base 64"""
+    return urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    """Decodes unpadded, URL-safe base 64"""
+    return urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+class BloomFilter:
+    """Fixed-size set of strings that may answer false positives, but
+    never false negatives, in constant memory"""
+
+    def __init__(self, size: int = 1 << 20, hashes: int = 7):
+        """Initializes an instance of this class
+
+        Args:
+            size - the number of bits of the filter
+            hashes - the number of bits set per item
+        """
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray((size + 7) // 8)
+
+    def _positions(self, item: str):
+        """Yields the bit positions of a given item"""
+        digest = hashlib.sha256(item.encode()).digest()
+        for i in range(self.hashes):
+            chunk = digest[4 * i:4 * i + 4]
+            yield int.from_bytes(chunk, 'big') % self.size
+
+    def add(self, item: str) -> None:
+        """Adds a given item to the filter"""
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        """Checks if a given item may have been added to the filter"""
+        return all(self.bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(item))
+
+
+class RevocationLog:
+    """Log of the revoked session nonces, in a SQLite database shared by
+    the worker processes of a host. Rows are numbered in the order they
+    were written, so each worker reads only the ones it has not seen."""
+
+    def __init__(self, file_path: str):
+        """Initializes an instance of this class
+
+        Args:
+            file_path - path of the SQLite database file
+        """
+        self.file_path = file_path
+        self._local = threading.local()
+        thread_connection(self._local, file_path).execute(
+            'CREATE TABLE IF NOT EXISTS revocations '
+            '(id INTEGER PRIMARY KEY AUTOINCREMENT, nonce TEXT NOT NULL, '
+            'expires_at REAL NOT NULL)')
+
+    def add(self, nonce: str, expires_at: float) -> None:
+        """Records a revocation
+
+        Args:
+            nonce - the nonce of the revoked session
+            expires_at - when the session expires, 0 for never
+        """
+        thread_connection(self._local, self.file_path).execute(
+            'INSERT INTO revocations (nonce, expires_at) VALUES (?, ?)',
+            (nonce, expires_at))
+
+    def since(self, last_id: int) -> Tuple[int, List[str]]:
+        """Reads the revocations recorded after a given one
+
+        Args:
+            last_id - the ID of the last revocation already read
+
+        Returns:
+            the ID of the last revocation read, and the new nonces
+        """
+        rows = thread_connection(self._local, self.file_path).execute(
+            'SELECT id, nonce FROM revocations WHERE id > ? ORDER BY id',
+            (last_id,)).fetchall()
+        if len(rows) == 0:
+            return last_id, []
+        return rows[-1][0], [nonce for _, nonce in rows]
+
+    def purge(self) -> int:
+        """Deletes the revocations of expired sessions
+
+        Returns:
+            the number of deleted revocations
+        """
+        return thread_connection(self._local, self.file_path).execute(
+            'DELETE FROM revocations WHERE expires_at > 0 '
+            'AND expires_at < ?', (time.time(),)).rowcount
+
+
+class SignedSessionAuth(SessionAuth):
+    """Manages sessions carried by HMAC-signed cookies.
+
+    A session ID is "<payload>.<signature>", the payload holding the user
+    ID, the expiration time and a nonce, so verifying it takes an HMAC and
+    no lookup. Logging out records the nonce in a bloom filter; two
+    generations of filters are kept and rotated every SESSION_DURATION
+    seconds, so a revocation outlives the session it revokes.
+    SESSION_SECRET must be shared by every worker: without it, a random
+    secret is drawn and sessions only hold within the process.
+    The bloom filters are in the memory of the process, so a revocation
+    only holds in the worker that served the logout, unless
+    SESSION_STORE=sqlite: revocations are then also written to a
+    RevocationLog at SESSION_STORE_PATH, which every worker pulls into
+    its own filters every SESSION_REVOCATION_SYNC_INTERVAL seconds.
+    Lookups never query it: a logout takes up to that interval to reach
+    the other workers.
+    """
+
+    # no session store: the session ID is the session
+    uses_session_store = False
+
+    def __init__(self):
+        """Initializes an instance of this class"""
+        super().__init__()
+        self.session_duration = int(getenv("SESSION_DURATION", 0))
+        secret = getenv("SESSION_SECRET")
+        self.secret = secret.encode() if secret else os.urandom(32)
+        self._revoked = [BloomFilter(), BloomFilter()]
+        self._revoked_since = time.time()
+        self._revoked_lock = threading.Lock()
+        self.revocation_log = None
+        self._last_revocation = 0
+        if getenv("SESSION_STORE") == "sqlite":
+            self.revocation_log = RevocationLog(
+                getenv("SESSION_STORE_PATH", ".db_sessions.sqlite3"))
+            self.sync_interval = float(
+                getenv("SESSION_REVOCATION_SYNC_INTERVAL", 5))
+            self.sync_revocations()
+            threading.Thread(target=self._sync_forever, daemon=True).start()
+
+    def sync_revocations(self) -> int:
+        """Adds the revocations logged by any worker since the last
+        synchronization to the bloom filters of this one
+
+        Returns:
+            the number of revocations added
+        """
+        last_id, nonces = self.revocation_log.since(self._last_revocation)
+        with self._revoked_lock:
+            for nonce in nonces:
+                self._revoked[0].add(nonce)
+        self._last_revocation = last_id
+        return len(nonces)
+
+    def _sync_forever(self) -> None:
+        """Synchronizes the revocations every sync_interval seconds, and
+        purges the ones of expired sessions once per session duration"""
+        last_purge = time.time()
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync_revocations()
+                if 0 < self.session_duration < time.time() - last_purge:
+                    self.revocation_log.purge()
+                    last_purge = time.time()
+            except sqlite3.Error:
+                pass
+
+    def _sign(self, payload: str) -> str:
+        """Returns the signature of a given payload"""
+        return _b64encode(hmac.new(self.secret, payload.encode(),
+                                   hashlib.sha256).digest())
+
+    def create_session(self, user_id: str = None) -> str:
+        """creates a signed Session ID for a given user_id
+
+        Args:
+            user_id - id of a user instance for
+            whom a session ID is to be created
+
+        Returns:
+            None if error occurs, otherwise a created session id is returned
+        """
+        if ((user_id is None) or (not isinstance(user_id, str))):
+            return None
+        expires_at = 0
+        if self.session_duration > 0:
+            expires_at = int(time.time()) + self.session_duration
+        payload = _b64encode('{}:{}:{}'.format(
+            user_id, expires_at, _b64encode(os.urandom(12))).encode())
+        return '{}.{}'.format(payload, self._sign(payload))
+
+    def _verify(self, session_id: str) -> Union[tuple, None]:
+        """Checks the signature and the expiration of a given session ID
+
+        Returns:
+            the (user ID, nonce, expiration time) of the session if
+            valid, otherwise None
+        """
+        if (session_id is None) or not (type(session_id) is str):
+            return None
+        payload, _, signature = session_id.partition('.')
+        if not hmac.compare_digest(self._sign(payload).encode(),
+                                   signature.encode()):
+            return None
+        try:
+            user_id, expires_at, nonce = \
+                _b64decode(payload).decode().rsplit(':', 2)
+            expires_at = int(expires_at)
+        except ValueError:
+            return None
+        if expires_at and expires_at < time.time():
+            return None
+        return user_id, nonce, expires_at
+
+    def _rotate_revoked(self) -> None:
+        """Drops the oldest generation of revocations once it only
+        holds sessions that expired anyway"""
+        if self.session_duration <= 0:
+            return
+        with self._revoked_lock:
+            if time.time() - self._revoked_since < self.session_duration:
+                return
+            self._revoked = [BloomFilter(), self._revoked[0]]
+            self._revoked_since = time.time()
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """Retrieves a user ID, based on a provided session ID
+
+        Args:
+            session_id - the session ID whose
+            associated user ID is to be retrieved
+
+        Returns:
+            user ID that is associated with
+            the given session ID, otherwise None
+        """
+        session = self._verify(session_id)
+        if session is None:
+            return None
+        user_id, nonce, _ = session
+        self._rotate_revoked()
+        if any(nonce in revoked for revoked in self._revoked):
+            return None
+        return user_id
+
+    def destroy_session(self, request=None):
+        """Revokes the session of a request
+
+        Args:
+            request - a request object from a user or client
+        """
+        if request is None:
+            return False
+        session_id = self.session_cookie(request)
+        if self.user_id_for_session_id(session_id) is None:
+            return False
+        _, nonce, expires_at = self._verify(session_id)
+        with self._revoked_lock:
+            self._revoked[0].add(nonce)
+        if self.revocation_log is not None:
+            self.revocation_log.add(nonce, expires_at)
+        return True
@@ -2,18 +2,134 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import abort, jsonify, request, Response, url_for
 from models.user import User
+from typing import Callable, Iterator
+import hashlib
+import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+PAGE_SIZE = 1000
+# compact, and without the check for circular references: to_json()
+# only holds strings, numbers and None
+ENCODER = json.JSONEncoder(separators=(',', ':'), check_circular=False)
+
+
+def dumps(obj: dict) -> str:
+    """ Serialize a JSON dictionary, with orjson if it is installed
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return ENCODER.encode(obj)
+
+
+def json_response(obj: dict, status: int = 200) -> Response:
+    """ Build a JSON response through dumps(), instead of jsonify()
+    """
+    return Response(dumps(obj) + '\n', status=status,
+                    mimetype='application/json')
+
+
+def iter_users(after: str = None) -> Iterator[User]:
+    """ Yield the users in ascending order of ID, after a given ID,
+    fetching them PAGE_SIZE at a time
+    """
+    while True:
+        users = User.page(after, PAGE_SIZE)
+        yield from users
+        if len(users) < PAGE_SIZE:
+            return
+        after = users[-1].id
+
+
+def stream_json_array(users: Iterator[User]) -> Iterator[str]:
+    """ Yield a JSON array of users, one element at a time
+    """
+    yield '['
+    separator = ''
+    for user in users:
+        yield separator + dumps(user.to_json())
+        separator = ','
+    yield ']\n'
+
+
+def stream_ndjson(users: Iterator[User]) -> Iterator[str]:
+    """ Yield users as newline-delimited JSON
+    """
+    for user in users:
+        yield dumps(user.to_json()) + '\n'
+
+
+def conditional_response(etag: str, build: Callable[[], Response]) -> Response:
+    """ Return 304 Not Modified if the request's If-None-Match header
+    matches etag, without building the response; otherwise the built
+    response, tagged with etag
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    return response
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters:
+      - limit (optional): maximum number of users to return, at most
+        PAGE_SIZE
+      - after (optional): only return users whose ID comes after it
+      - format (optional): "ndjson" for one JSON object per line
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, in ascending order of ID,
+        streamed; when limit is reached, a Link header gives the next page
+      - 304 if the If-None-Match header matches the listing's ETag
+      - 400 if limit is not an integer between 1 and PAGE_SIZE
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    after = request.args.get('after')
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0 or limit > PAGE_SIZE:
+            return jsonify({'error': "Wrong limit"}), 400
+
+    etag = "users-{}-{}".format(
+        User.collection_version(),
+        hashlib.sha1(request.query_string).hexdigest()[:12])
+    return conditional_response(etag, lambda: list_users(after, limit))
+
+
+def list_users(after: str, limit: int) -> Response:
+    """ Build the streamed response of GET /api/v1/users
+    """
+    headers = {}
+    if limit is not None:
+        # the next page is only computed when a limit is given, so that
+        # a full listing stays a single pass over the users; the limit
+        # is at most PAGE_SIZE, which bounds the users held in memory
+        users = User.page(after, limit)
+        if len(users) == limit:
+            # every other query parameter, such as format, carries over
+            args = dict(request.args, after=users[-1].id, limit=limit)
+            headers['Link'] = '<{}>; rel="next"'.format(
+                url_for(request.endpoint, _external=True, **args))
+        users = iter(users)
+    else:
+        users = iter_users(after)
+
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_ndjson(users), headers=headers,
+                        mimetype='application/x-ndjson')
+    return Response(stream_json_array(users), headers=headers,
+                    mimetype='application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -23,6 +139,7 @@ def view_one_user(user_id: str = None) -> str:
       - User ID
     Return:
       - User object JSON represented
+      - 304 if the If-None-Match header matches the User's ETag
       - 404 if the User ID doesn't exist
     """
     if user_id is None:
@@ -30,11 +147,13 @@ def view_one_user(user_id: str = None) -> str:
     if user_id == "me":
         if request.current_user is None:
             abort(404)
-        return jsonify(request.current_user.to_json())
-    user = User.get(user_id)
+        user = request.current_user
+    else:
+        user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return conditional_response(user.etag(),
+                                lambda: json_response(user.to_json()))
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -87,7 +206,7 @@ def create_user() -> str:
             user.first_name = rj.get("first_name")
             user.last_name = rj.get("last_name")
             user.save()
-            return jsonify(user.to_json()), 201
+            return json_response(user.to_json(), 201)
         except Exception as e:
             error_msg = "Can't create User: {}".format(e)
     return jsonify({'error': error_msg}), 400
@@ -123,4 +242,4 @@ def update_user(user_id: str = None) -> str:
     if rj.get('last_name') is not None:
         user.last_name = rj.get('last_name')
     user.save()
-    return jsonify(user.to_json()), 200
+    return json_response(user.to_json())
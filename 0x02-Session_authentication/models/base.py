@@ -2,26 +2,60 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from typing import TypeVar, List, Iterable, Tuple, Dict, Any, Optional
+from os import path, getenv
+import bisect
 import json
+import os
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+INDEXED_VALUES = {}
+# ids of each class in ascending order, built on the first page() call
+SORTED_IDS = {}
+SORTED_IDS_LOCKS = {}
+# number of changes of each class since startup; the startup token tells
+# apart the counters of two runs of the process
+VERSIONS = {}
+STARTUP_TOKEN = uuid.uuid4().hex[:8]
+# caches kept in the __dict__ of objects, never serialized
+TRANSIENT_ATTRIBUTES = frozenset(('_json_cache', '_timestamps'))
+
+# "snapshot" rewrites .db_<Class>.json on every change, "journal" appends
+# one line per change to .db_<Class>.log and compacts it in the background
+JSON_STORAGE_MODE = getenv("JSON_STORAGE_MODE", "snapshot")
+JOURNAL_MAX_SIZE = int(getenv("JSON_JOURNAL_MAX_SIZE", 1024 * 1024))
+JOURNAL_LOCKS = {}
+COMPACTING = set()
+
+# "json" keeps the objects in memory and in the files above, "sqlite"
+# delegates get/search/count/save/remove to a SQLite database instead
+storage = None
+if getenv("STORAGE_TYPE") == "sqlite":
+    from models.storage import SQLiteStorage
+    storage = SQLiteStorage(getenv("STORAGE_SQLITE_PATH", ".db.sqlite3"))
 
 
 class Base():
     """ Base class
     """
 
+    # attributes backed by a secondary hash index, so that an equality
+    # search on them is a dict lookup instead of a scan over all objects
+    indexed_attributes: Tuple[str, ...] = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+        if INDEXES.get(s_class) is None:
+            self.__class__._reset_indexes()
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
@@ -34,6 +68,8 @@ class Base():
                                                 TIMESTAMP_FORMAT)
         else:
             self.updated_at = datetime.utcnow()
+        # bumped by every save(), persisted but not part of to_json()
+        self._version = kwargs.get('_version', 0)
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -44,15 +80,46 @@ class Base():
             return False
         return (self.id == other.id)
 
+    def __setattr__(self, name: str, value: Any):
+        """ Set an attribute, dropping the cached JSON dictionaries
+        """
+        if name not in TRANSIENT_ATTRIBUTES:
+            self.__dict__.pop('_json_cache', None)
+        object.__setattr__(self, name, value)
+
     def to_json(self, for_serialization: bool = False) -> dict:
-        """ Convert the object a JSON dictionary
+        """ Convert the object a JSON dictionary.
+        The result is memoized until an attribute is set (save() sets
+        updated_at), and the string of each datetime is kept until that
+        datetime changes; a value mutated in place, without setting the
+        attribute, is not seen until then
         """
+        cache = self.__dict__.get('_json_cache')
+        if cache is None:
+            cache = self.__dict__['_json_cache'] = {}
+        result = cache.get(for_serialization)
+        if result is None:
+            result = cache[for_serialization] = \
+                self._build_json(for_serialization)
+        return dict(result)
+
+    def _build_json(self, for_serialization: bool) -> dict:
+        """ Build the JSON dictionary memoized by to_json()
+        """
+        timestamps = self.__dict__.get('_timestamps')
+        if timestamps is None:
+            timestamps = self.__dict__['_timestamps'] = {}
         result = {}
         for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
+            if key[0] == '_' and (not for_serialization or
+                                  key in TRANSIENT_ATTRIBUTES):
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                cached = timestamps.get(key)
+                if cached is None or cached[0] != value:
+                    cached = timestamps[key] = \
+                        (value, value.strftime(TIMESTAMP_FORMAT))
+                result[key] = cached[1]
             else:
                 result[key] = value
         return result
@@ -64,13 +131,21 @@ class Base():
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         DATA[s_class] = {}
-        if not path.exists(file_path):
+        SORTED_IDS.pop(s_class, None)
+        VERSIONS[s_class] = VERSIONS.get(s_class, 0) + 1
+        cls._reset_indexes()
+        if storage is not None:
+            storage.load(cls)
             return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        if path.exists(file_path):
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
+                for obj_id, obj_json in objs_json.items():
+                    obj = cls(**obj_json)
+                    DATA[s_class][obj_id] = obj
+                    cls._index_add(obj)
+        if JSON_STORAGE_MODE == "journal":
+            cls.replay_journal()
 
     @classmethod
     def save_to_file(cls):
@@ -85,27 +160,237 @@ class Base():
         with open(file_path, 'w') as f:
             json.dump(objs_json, f)
 
+    @classmethod
+    def _journal_lock(cls) -> threading.Lock:
+        """ Lock serializing the journal writes of the class
+        """
+        return JOURNAL_LOCKS.setdefault(cls.__name__, threading.Lock())
+
+    @classmethod
+    def _sorted_ids_lock(cls) -> threading.Lock:
+        """ Lock serializing the changes and reads of the sorted ids
+        of the class, together with its objects
+        """
+        return SORTED_IDS_LOCKS.setdefault(cls.__name__, threading.Lock())
+
+    @classmethod
+    def replay_journal(cls):
+        """ Apply the journaled changes on top of the loaded snapshot.
+        A rotated journal left over by an interrupted compaction is
+        replayed first; a torn last line ends the replay
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.log".format(s_class)
+        SORTED_IDS.pop(s_class, None)
+        for log_path in (file_path + ".1", file_path):
+            if not path.exists(log_path):
+                continue
+            with open(log_path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    obj_id = entry.get('id')
+                    cls._index_remove(obj_id)
+                    if entry.get('op') == 'remove':
+                        DATA[s_class].pop(obj_id, None)
+                        continue
+                    obj = cls(**entry.get('obj'))
+                    DATA[s_class][obj_id] = obj
+                    cls._index_add(obj)
+
+    @classmethod
+    def append_to_journal(cls, op: str, obj: TypeVar('Base')):
+        """ Append one change to the journal of the class, and start a
+        background compaction once the journal grows past JOURNAL_MAX_SIZE
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.log".format(s_class)
+        entry = {'op': op, 'id': obj.id}
+        if op == 'save':
+            entry['obj'] = obj.to_json(True)
+        line = json.dumps(entry) + "\n"
+
+        with cls._journal_lock():
+            with open(file_path, 'a') as f:
+                f.write(line)
+                size = f.tell()
+            if size < JOURNAL_MAX_SIZE or s_class in COMPACTING:
+                return
+            COMPACTING.add(s_class)
+        threading.Thread(target=cls.compact_journal, daemon=True).start()
+
+    @classmethod
+    def compact_journal(cls):
+        """ Fold the journal into the .db_<Class>.json snapshot.
+        The journal is rotated together with a copy of the objects, so
+        new changes keep being appended while the snapshot is written
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        log_path = ".db_{}.log".format(s_class)
+        try:
+            with cls._journal_lock():
+                objs = dict(DATA[s_class])
+                if path.exists(log_path) and \
+                        not path.exists(log_path + ".1"):
+                    os.replace(log_path, log_path + ".1")
+            objs_json = {}
+            for obj_id, obj in objs.items():
+                objs_json[obj_id] = obj.to_json(True)
+            with open(file_path + ".tmp", 'w') as f:
+                json.dump(objs_json, f)
+            os.replace(file_path + ".tmp", file_path)
+            if path.exists(log_path + ".1"):
+                os.remove(log_path + ".1")
+        finally:
+            COMPACTING.discard(s_class)
+
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self._version += 1
+        if storage is not None:
+            storage.save(self)
+            return
+        VERSIONS[s_class] = VERSIONS.get(s_class, 0) + 1
+        with self.__class__._sorted_ids_lock():
+            sorted_ids = SORTED_IDS.get(s_class)
+            if sorted_ids is not None and self.id not in DATA[s_class]:
+                bisect.insort(sorted_ids, self.id)
+            DATA[s_class][self.id] = self
+        self.__class__._index_remove(self.id)
+        self.__class__._index_add(self)
+        if JSON_STORAGE_MODE == "journal":
+            self.__class__.append_to_journal('save', self)
+        else:
+            self.__class__.save_to_file()
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        if storage is not None:
+            storage.remove(self)
+            return
+        with self.__class__._sorted_ids_lock():
+            removed = DATA[s_class].pop(self.id, None) is not None
+            sorted_ids = SORTED_IDS.get(s_class)
+            if removed and sorted_ids is not None:
+                del sorted_ids[bisect.bisect_left(sorted_ids, self.id)]
+        if removed:
+            VERSIONS[s_class] = VERSIONS.get(s_class, 0) + 1
+            self.__class__._index_remove(self.id)
+            if JSON_STORAGE_MODE == "journal":
+                self.__class__.append_to_journal('remove', self)
+            else:
+                self.__class__.save_to_file()
+
+    @classmethod
+    def remove_all(cls, objs: Iterable[TypeVar('Base')]) -> int:
+        """ Remove many objects at once, writing the storage only once
+        """
+        s_class = cls.__name__
+        objs = list(objs)
+        if storage is not None:
+            return storage.remove_many(cls, [obj.id for obj in objs])
+        removed = []
+        with cls._sorted_ids_lock():
+            for obj in objs:
+                if DATA[s_class].pop(obj.id, None) is not None:
+                    cls._index_remove(obj.id)
+                    removed.append(obj)
+            if len(removed) == 0:
+                return 0
+            SORTED_IDS.pop(s_class, None)
+        VERSIONS[s_class] = VERSIONS.get(s_class, 0) + 1
+        if JSON_STORAGE_MODE == "journal":
+            for obj in removed:
+                cls.append_to_journal('remove', obj)
+        else:
+            cls.save_to_file()
+        return len(removed)
+
+    def etag(self) -> str:
+        """ Strong entity tag of the object, which changes on every save()
+        """
+        return "{}-{}".format(self.id, self._version)
+
+    @classmethod
+    def collection_version(cls) -> str:
+        """ Version of the whole collection of the class, which changes
+        whenever one of its objects is saved or removed
+        """
+        s_class = cls.__name__
+        if storage is not None:
+            return str(storage.version(cls))
+        return "{}-{}".format(STARTUP_TOKEN, VERSIONS.get(s_class, 0))
+
+    @classmethod
+    def _reset_indexes(cls):
+        """ Drop all secondary indexes of the class
+        """
+        s_class = cls.__name__
+        INDEXES[s_class] = {attr: {} for attr in cls.indexed_attributes}
+        INDEXED_VALUES[s_class] = {}
+
+    @classmethod
+    def _index_add(cls, obj: TypeVar('Base')):
+        """ Register an object in the secondary indexes of its class
+        """
+        s_class = cls.__name__
+        indexed = {}
+        for attr, index in INDEXES[s_class].items():
+            value = getattr(obj, attr, None)
+            try:
+                index.setdefault(value, {})[obj.id] = obj
+            except TypeError:
+                # unhashable values are left to the linear scan
+                continue
+            indexed[attr] = value
+        INDEXED_VALUES[s_class][obj.id] = indexed
+
+    @classmethod
+    def _index_remove(cls, obj_id: str):
+        """ Unregister an object from the secondary indexes of its class,
+        using the values it was indexed with
+        """
+        s_class = cls.__name__
+        indexed = INDEXED_VALUES[s_class].pop(obj_id, None)
+        if indexed is None:
+            return
+        for attr, value in indexed.items():
+            bucket = INDEXES[s_class][attr].get(value)
+            if bucket is None:
+                continue
+            bucket.pop(obj_id, None)
+            if len(bucket) == 0:
+                del INDEXES[s_class][attr][value]
+
+    @classmethod
+    def _index_lookup(cls, attr: str,
+                      value: Any) -> Optional[Dict[str, TypeVar('Base')]]:
+        """ Return the objects indexed under attr == value, or None if
+        attr is not indexed (or value can't be looked up)
+        """
+        index = INDEXES[cls.__name__].get(attr)
+        if index is None:
+            return None
+        try:
+            return index.get(value, {})
+        except TypeError:
+            return None
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
+        if storage is not None:
+            return storage.count(cls)
         s_class_objs = DATA.get(s_class)
         if s_class_objs:
             return len(s_class_objs.keys())
@@ -117,11 +402,33 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = 100) -> List[TypeVar('Base')]:
+        """ Return at most limit objects, in ascending order of ID,
+        starting right after the ID after (from the first one if None)
+        """
+        s_class = cls.__name__
+        if storage is not None:
+            return storage.page(cls, after, limit)
+        with cls._sorted_ids_lock():
+            sorted_ids = SORTED_IDS.get(s_class)
+            if sorted_ids is None:
+                sorted_ids = sorted(DATA[s_class])
+                SORTED_IDS[s_class] = sorted_ids
+            start = 0
+            if after is not None:
+                start = bisect.bisect_right(sorted_ids, after)
+            return [DATA[s_class][obj_id]
+                    for obj_id in sorted_ids[start:start + limit]]
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
         s_class = cls.__name__
+        if storage is not None:
+            return storage.get(cls, id)
         return DATA[s_class].get(id)
 
     @classmethod
@@ -129,6 +436,9 @@ class Base():
         """ Search all objects with matching attributes
         """
         s_class = cls.__name__
+        if storage is not None:
+            return storage.search(cls, attributes)
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -137,4 +447,14 @@ class Base():
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        # narrow the candidates down with the most selective index
+        # available, and only scan every object as a last resort
+        candidates = DATA[s_class]
+        if attributes.get('id') is not None:
+            obj = DATA[s_class].get(attributes.get('id'))
+            candidates = {} if obj is None else {obj.id: obj}
+        for k, v in attributes.items():
+            bucket = cls._index_lookup(k, v)
+            if bucket is not None and len(bucket) < len(candidates):
+                candidates = bucket
+        return list(filter(_search, list(candidates.values())))
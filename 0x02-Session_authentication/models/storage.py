@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""This module houses the storage backends that models.base.Base
+can delegate its persistence to, instead of the default JSON files"""
+from typing import (
+    TypeVar,
+    List,
+    Dict,
+    Any
+)
+import json
+import sqlite3
+import threading
+
+
+def thread_connection(local: threading.local,
+                      file_path: str) -> sqlite3.Connection:
+    """Returns the connection of the current thread to a SQLite database
+    in WAL mode, which lets several worker processes read and write the
+    same file, opening it on first use
+
+    Args:
+        local - the thread-local data the connection is kept in
+        file_path - path of the SQLite database file
+    """
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(file_path, timeout=30,
+                               isolation_level=None,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        local.conn = conn
+    return conn
+
+
+class Storage:
+    """Interface of a storage backend. Every method receives the model
+    class (or instance) it works on, so one backend serves all models"""
+
+    def load(self, cls) -> None:
+        """Prepares the storage of a given model class"""
+        raise NotImplementedError
+
+    def save(self, obj: TypeVar('Base')) -> None:
+        """Inserts or updates a given object"""
+        raise NotImplementedError
+
+    def remove(self, obj: TypeVar('Base')) -> None:
+        """Deletes a given object"""
+        raise NotImplementedError
+
+    def remove_many(self, cls, ids: List[str]) -> int:
+        """Deletes the objects of a given class with the given ids,
+        and returns how many were deleted"""
+        raise NotImplementedError
+
+    def count(self, cls) -> int:
+        """Returns the number of stored objects of a given class"""
+        raise NotImplementedError
+
+    def version(self, cls) -> int:
+        """Returns a number that changes whenever an object of a given
+        class is saved or removed"""
+        raise NotImplementedError
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """Returns the object of a given class with a given id, or None"""
+        raise NotImplementedError
+
+    def page(self, cls, after: str, limit: int) -> List[TypeVar('Base')]:
+        """Returns at most limit objects of a given class, in ascending
+        order of id, whose id comes after a given one (if not None)"""
+        raise NotImplementedError
+
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """Returns the objects of a given class matching all attributes"""
+        raise NotImplementedError
+
+
+class SQLiteStorage(Storage):
+    """Stores every model class in its own SQLite table.
+
+    Each row keeps the serialized object in a `data` column, next to one
+    indexed column per attribute listed in the class' indexed_attributes,
+    so that lookups on those attributes never deserialize other rows.
+    The database runs in WAL mode, which lets several worker processes
+    read and write the same file consistently.
+    """
+
+    def __init__(self, file_path: str):
+        """Initializes an instance of this class
+
+        Args:
+            file_path - path of the SQLite database file
+        """
+        self.file_path = file_path
+        self._local = threading.local()
+        self._tables = set()
+        self._lock = threading.Lock()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Connection of the current thread, opened on first use"""
+        return thread_connection(self._local, self.file_path)
+
+    @staticmethod
+    def _column_value(value: Any) -> Any:
+        """Converts a value to something SQLite can store and compare"""
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return json.dumps(value, default=str)
+
+    def _table(self, cls) -> str:
+        """Returns the quoted table name of a given class,
+        creating the table and its indexes if needed"""
+        s_class = cls.__name__
+        table = '"{}"'.format(s_class)
+        if s_class in self._tables:
+            return table
+        with self._lock:
+            conn = self._conn
+            conn.execute('CREATE TABLE IF NOT EXISTS {} '
+                         '(id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+                         .format(table))
+            conn.execute('CREATE TABLE IF NOT EXISTS _versions '
+                         '(name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            columns = [row[1] for row in
+                       conn.execute('PRAGMA table_info({})'.format(table))]
+            for attr in cls.indexed_attributes:
+                if attr not in columns:
+                    conn.execute('ALTER TABLE {} ADD COLUMN "{}"'
+                                 .format(table, attr))
+                    conn.execute('UPDATE {0} SET "{1}" = '
+                                 'json_extract(data, \'$.{1}\')'
+                                 .format(table, attr))
+                conn.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" '
+                             'ON {2} ("{1}")'.format(s_class, attr, table))
+            self._tables.add(s_class)
+        return table
+
+    def load(self, cls) -> None:
+        """Creates the table of a given model class if needed"""
+        self._table(cls)
+
+    def _bump_version(self, cls) -> None:
+        """Increments the version of a given class"""
+        self._conn.execute(
+            'INSERT INTO _versions (name, version) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET version = version + 1',
+            (cls.__name__,))
+
+    def version(self, cls) -> int:
+        """Returns the version of a given class, shared by every process
+        using the database"""
+        self._table(cls)
+        row = self._conn.execute('SELECT version FROM _versions '
+                                 'WHERE name = ?', (cls.__name__,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def save(self, obj: TypeVar('Base')) -> None:
+        """Inserts or updates a given object"""
+        cls = obj.__class__
+        table = self._table(cls)
+        columns = ''.join(', "{}"'.format(a) for a in cls.indexed_attributes)
+        updates = ''.join(', "{0}" = excluded."{0}"'.format(a)
+                          for a in cls.indexed_attributes)
+        params = [obj.id, json.dumps(obj.to_json(True))]
+        params += [self._column_value(getattr(obj, a, None))
+                   for a in cls.indexed_attributes]
+        self._conn.execute(
+            'INSERT INTO {} (id, data{}) VALUES ({}) '
+            'ON CONFLICT(id) DO UPDATE SET data = excluded.data{}'
+            .format(table, columns, ', '.join('?' * len(params)), updates),
+            params)
+        self._bump_version(cls)
+
+    def remove(self, obj: TypeVar('Base')) -> None:
+        """Deletes a given object"""
+        table = self._table(obj.__class__)
+        self._conn.execute('DELETE FROM {} WHERE id = ?'.format(table),
+                           (obj.id,))
+        self._bump_version(obj.__class__)
+
+    def remove_many(self, cls, ids: List[str]) -> int:
+        """Deletes the objects of a given class with the given ids,
+        in a single transaction"""
+        table = self._table(cls)
+        conn = self._conn
+        conn.execute('BEGIN')
+        try:
+            count = conn.executemany(
+                'DELETE FROM {} WHERE id = ?'.format(table),
+                [(id,) for id in ids]).rowcount
+            self._bump_version(cls)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return count
+
+    def count(self, cls) -> int:
+        """Returns the number of stored objects of a given class"""
+        table = self._table(cls)
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM {}'.format(table)).fetchone()[0]
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """Returns the object of a given class with a given id, or None"""
+        table = self._table(cls)
+        row = self._conn.execute(
+            'SELECT data FROM {} WHERE id = ?'.format(table),
+            (id,)).fetchone()
+        if row is None:
+            return None
+        return cls(**json.loads(row[0]))
+
+    def page(self, cls, after: str, limit: int) -> List[TypeVar('Base')]:
+        """Returns at most limit objects of a given class, in ascending
+        order of id, whose id comes after a given one (if not None);
+        walks the primary key index"""
+        table = self._table(cls)
+        rows = self._conn.execute(
+            'SELECT data FROM {} WHERE id > ? ORDER BY id LIMIT ?'
+            .format(table), ('' if after is None else after, limit))
+        return [cls(**json.loads(row[0])) for row in rows]
+
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """Returns the objects of a given class matching all attributes.
+        The id and indexed attributes are matched by SQLite, the other
+        ones on the deserialized objects"""
+        table = self._table(cls)
+        clauses = []
+        params = []
+        others: Dict[str, Any] = {}
+        for k, v in attributes.items():
+            if k == 'id' or k in cls.indexed_attributes:
+                clauses.append('"{}" IS ?'.format(k))
+                params.append(self._column_value(v))
+            else:
+                others[k] = v
+        query = 'SELECT data FROM {}'.format(table)
+        if len(clauses) > 0:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY rowid'
+
+        result = []
+        for row in self._conn.execute(query, params):
+            obj = cls(**json.loads(row[0]))
+            if all(getattr(obj, k) == v for k, v in others.items()):
+                result.append(obj)
+        return result
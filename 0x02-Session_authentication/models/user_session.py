@@ -9,6 +9,8 @@ from .base import (
 class UserSession(Base):
     """Manages the storage of users' session information"""
 
+    indexed_attributes = ('session_id', 'user_id')
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initializes an instance of this class
         
@@ -17,5 +19,8 @@ class UserSession(Base):
             kwargs - list of keyword arguments
         """
         super().__init__(*args, **kwargs)
-        self.user_id = ""
-        self.session_id = ""
+        self.user_id = kwargs.get('user_id', "")
+        self.session_id = kwargs.get('session_id', "")
+        # deadline of the session as a POSIX timestamp, None if it
+        # never expires
+        self.expires_at = kwargs.get('expires_at')
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Checks that the sessions of SESSION_STORE=sqlite are shared by
+worker processes: each step runs in its own process, which imports the
+application afresh, as a worker of a multi-process server would
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COOKIE = "_my_session_id"
+
+
+def _client(work_dir: str, env: Dict[str, str]):
+    """Returns a test client of the application, configured by env and
+    storing its files in work_dir"""
+    os.chdir(work_dir)
+    os.environ.update(env)
+    sys.path.insert(0, PROJECT_DIR)
+    from api.v1.app import app
+    return app.test_client(use_cookies=False)
+
+
+def log_in(work_dir: str, env: Dict[str, str]) -> Tuple[int, str]:
+    """Creates a user and logs it in
+
+    Returns:
+        the ID of the process, and the session ID of the cookie
+    """
+    client = _client(work_dir, env)
+    from models.user import User
+    user = User()
+    user.email = "bob@example.com"
+    user.password = "pwd"
+    user.save()
+    response = client.post("/api/v1/auth_session/login",
+                           data={"email": user.email, "password": "pwd"})
+    assert response.status_code == 200
+    cookie = response.headers["Set-Cookie"].split(";")[0]
+    return os.getpid(), cookie.split("=", 1)[1]
+
+
+def look_up(work_dir: str, env: Dict[str, str],
+            session_id: str) -> Tuple[int, int]:
+    """Requests the current user with a given session ID
+
+    Returns:
+        the ID of the process, and the status code of the response
+    """
+    client = _client(work_dir, env)
+    response = client.get("/api/v1/users/me", headers={
+        "Cookie": "{}={}".format(COOKIE, session_id)})
+    return os.getpid(), response.status_code
+
+
+def log_out(work_dir: str, env: Dict[str, str],
+            session_id: str) -> Tuple[int, int]:
+    """Logs out the session of a given session ID
+
+    Returns:
+        the ID of the process, and the status code of the response
+    """
+    client = _client(work_dir, env)
+    response = client.delete("/api/v1/auth_session/logout", headers={
+        "Cookie": "{}={}".format(COOKIE, session_id)})
+    return os.getpid(), response.status_code
+
+
+def in_new_process(fn, *args):
+    """Runs fn(*args) in a new process, and returns its result"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(fn, *args).result(timeout=60)
+
+
+class TestSharedSessions(unittest.TestCase):
+    """Sessions created by one process are seen and destroyed by others"""
+
+    def check_auth_type(self, auth_type: str):
+        """Logs in, looks up and logs out in three processes"""
+        env = {"AUTH_TYPE": auth_type, "SESSION_NAME": COOKIE,
+               "SESSION_STORE": "sqlite", "SESSION_DURATION": "60",
+               "SESSION_SECRET": "secret"}
+        with tempfile.TemporaryDirectory() as work_dir:
+            login_pid, session_id = in_new_process(log_in, work_dir, env)
+            lookup_pid, status = in_new_process(look_up, work_dir, env,
+                                                session_id)
+            self.assertNotEqual(login_pid, lookup_pid)
+            self.assertEqual(status, 200)
+            logout_pid, status = in_new_process(log_out, work_dir, env,
+                                                session_id)
+            self.assertNotIn(logout_pid, (login_pid, lookup_pid))
+            self.assertEqual(status, 200)
+            _, status = in_new_process(look_up, work_dir, env, session_id)
+            self.assertEqual(status, 403)
+
+    def test_session_auth(self):
+        """Sessions of session_auth are shared"""
+        self.check_auth_type("session_auth")
+
+    def test_session_exp_auth(self):
+        """Sessions of session_exp_auth are shared"""
+        self.check_auth_type("session_exp_auth")
+
+    def test_signed_session_auth(self):
+        """Revocations of signed_session_auth are shared"""
+        self.check_auth_type("signed_session_auth")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,13 +7,17 @@ from flask import (
     abort,
     Response,
     redirect,
-    url_for
+    url_for,
+    stream_with_context
 )
 from auth import Auth
+from typing import Iterator, Tuple
+import json
 
 
 app = Flask(__name__)
 AUTH = Auth()
+AUTH.db.init_app(app)
 
 
 @app.route('/', methods=['GET'])
@@ -22,6 +26,12 @@ def entry_point():
     return jsonify({"message": "Bienvenue"})
 
 
+@app.route('/stats/db', methods=['GET'])
+def db_stats():
+    """Returns the statistics of the database connection pool"""
+    return jsonify(AUTH.db.pool_stats())
+
+
 @app.route('/users', methods=['POST'])
 def users():
     """Creates a new user object and stores it in a database"""
@@ -40,6 +50,31 @@ def users():
         return jsonify({"message": "email already registered"}), 400
 
 
+def read_ndjson_users() -> Iterator[Tuple[str, str]]:
+    """Reads the (email, password) pairs of the request body, one JSON
+    object per line, without loading the whole body in memory"""
+    for line in request.stream:
+        if not line.strip():
+            continue
+        try:
+            user = json.loads(line)
+            yield user.get("email"), user.get("password")
+        except (ValueError, AttributeError):
+            yield None, None
+
+
+@app.route('/users/bulk', methods=['POST'])
+def users_bulk():
+    """Registers many users, read from a body of newline-delimited JSON
+    objects with an email and a password, and streams back the outcome
+    of each user, one JSON object per line, in the same order"""
+    def generate():
+        for result in AUTH.register_users(read_ndjson_users()):
+            yield json.dumps(result) + "\n"
+    return Response(stream_with_context(generate()),
+                    mimetype="application/x-ndjson")
+
+
 @app.route('/sessions', methods=['POST'])
 def login():
     """Logs a typical user in to the system"""
@@ -1,13 +1,101 @@
 #!/usr/bin/env python3
 """This module houses the implementation
 of the authentication aspect of the program"""
+import asyncio
 import bcrypt
-from db import DB
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from db import DB, BULK_CHUNK_SIZE
+from itertools import islice
 from user import User
 from sqlalchemy.orm.exc import NoResultFound
 from user import User
 from uuid import uuid4
-from typing import Union
+from typing import (
+    Union,
+    Any,
+    Callable,
+    Optional,
+    Dict,
+    Iterable,
+    Iterator,
+    Tuple
+)
+
+
+HASH_WORKERS: int = int(os.getenv('BCRYPT_WORKERS', os.cpu_count() or 1))
+HASH_QUEUE_SIZE: int = int(os.getenv('BCRYPT_QUEUE_SIZE', 64))
+# bcrypt work factor: each extra round doubles the hashing time
+BCRYPT_ROUNDS: int = int(os.getenv('BCRYPT_ROUNDS', 12))
+MIN_ROUNDS: int = 4
+MAX_ROUNDS: int = 31
+
+
+class HashingExecutor:
+    """Thread pool dedicated to bcrypt, which releases the GIL while
+    hashing. Submitting blocks once queue_size calls are already waiting
+    for a thread, so that login bursts apply backpressure.
+    """
+    def __init__(self, workers: int, queue_size: int):
+        """Initializes an instance of this class
+
+        Args:
+            workers - the number of hashing threads
+            queue_size - the number of calls allowed to wait for a thread
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn: Callable[..., Any], *args: Any,
+               timeout: Optional[float] = None) -> Future:
+        """Schedules fn(*args) on the pool
+
+        Args:
+            fn - the function to run, e.g. bcrypt.hashpw
+            args - the arguments of fn
+            timeout - how long to wait for room in the queue, in seconds
+
+        Returns:
+            a future of the result of fn
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Hashing queue is full")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Runs fn(*args) on the pool and waits for its result"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Runs fn(*args) on the pool and awaits its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+_hasher: Union[HashingExecutor, None] = None
+_hasher_lock = threading.Lock()
+
+
+def _get_hasher() -> HashingExecutor:
+    """Returns the hashing executor shared by the whole process,
+    sized by the BCRYPT_WORKERS and BCRYPT_QUEUE_SIZE variables
+
+    Returns:
+        the shared hashing executor
+    """
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = HashingExecutor(HASH_WORKERS, HASH_QUEUE_SIZE)
+        return _hasher
 
 
 def _hash_password(password: str) -> bytes:
@@ -19,10 +107,67 @@ def _hash_password(password: str) -> bytes:
     Returns:
         a hashed version of the password is hashed
     """
-    hash_pwd: bytes = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hash_pwd: bytes = _get_hasher().run(bcrypt.hashpw, password.encode(),
+                                        bcrypt.gensalt(BCRYPT_ROUNDS))
     return hash_pwd
 
 
+def _needs_rehash(hashed_password: Union[bytes, str]) -> bool:
+    """Checks whether a given hash was computed with another
+    work factor than the configured one
+
+    Args:
+        hashed_password - a bcrypt hash, as "$2b$<rounds>$..."
+
+    Returns:
+        True if the password should be hashed again, otherwise False
+    """
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode()
+    return int(hashed_password.split(b'$')[2]) != BCRYPT_ROUNDS
+
+
+def calibrate_rounds(budget_ms: float, min_rounds: int = MIN_ROUNDS,
+                     max_rounds: int = MAX_ROUNDS) -> int:
+    """Finds the highest bcrypt work factor whose hashing time
+    fits in a given latency budget on the current machine
+
+    Args:
+        budget_ms - the maximum time a hash may take, in milliseconds
+        min_rounds - the lowest acceptable work factor
+        max_rounds - the highest acceptable work factor
+
+    Returns:
+        the work factor to set BCRYPT_ROUNDS to
+    """
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > budget_ms:
+            break
+        chosen = rounds
+        # each round doubles the time: don't measure a bound-to-fail one
+        if elapsed_ms * 2 > budget_ms:
+            break
+    return chosen
+
+
+def _check_password(password: str, hashed_password: bytes) -> Future:
+    """Checks a given password against a hashed one, on the hashing pool
+
+    Args:
+        password - the plain password to be checked
+        hashed_password - the hashed password to check it against
+
+    Returns:
+        a future of True if both passwords match, otherwise of False
+    """
+    return _get_hasher().submit(bcrypt.checkpw, password.encode(),
+                                hashed_password)
+
+
 def _generate_uuid() -> str:
     """Generates uuid and returns it string representation
 
@@ -39,6 +184,11 @@ database.
     def __init__(self):
         self._db = DB()
 
+    @property
+    def db(self) -> DB:
+        """The database of the users"""
+        return self._db
+
     def register_user(self, email: str, password: str) -> User:
         """Registers a new user and stores the user's data in the database
 
@@ -58,6 +208,53 @@ database.
             user = self._db.add_user(email, pwd)
         return user
 
+    def register_users(self, users: Iterable[Tuple[str, str]],
+                       chunk_size: int = BULK_CHUNK_SIZE
+                       ) -> Iterator[Dict[str, str]]:
+        """Registers many users, chunk_size at a time: the passwords of a
+        chunk are hashed in parallel on the hashing pool, then the chunk
+        is inserted in one transaction. Nothing is hashed for an email
+        that is already registered.
+
+        Args:
+            users - the (email, password) pairs of the new users, read
+            lazily, so it may be a stream
+            chunk_size - the number of users handled at a time
+
+        Returns:
+            an iterator of the outcome of each user, in order, as
+            {"email": ..., "status": ...} where status is "created",
+            "conflict" if the email is already registered or "invalid"
+            if the email or the password is not a non-empty string
+        """
+        users = iter(users)
+        while True:
+            chunk = list(islice(users, chunk_size))
+            if len(chunk) == 0:
+                return
+            taken = self._db.existing_emails(
+                email for email, _ in chunk if isinstance(email, str))
+            statuses = []
+            hashes: Dict[str, Future] = {}
+            for email, password in chunk:
+                if not (isinstance(email, str) and email and
+                        isinstance(password, str) and password):
+                    statuses.append("invalid")
+                elif email in taken or email in hashes:
+                    statuses.append("conflict")
+                else:
+                    statuses.append("created")
+                    hashes[email] = _get_hasher().submit(
+                        bcrypt.hashpw, password.encode(),
+                        bcrypt.gensalt(BCRYPT_ROUNDS))
+            conflicts = set(self._db.add_users(
+                ((email, future.result()) for email, future in hashes.items()),
+                chunk_size))
+            for (email, _), status in zip(chunk, statuses):
+                if status == "created" and email in conflicts:
+                    status = "conflict"
+                yield {"email": email, "status": status}
+
     def valid_login(self, email: str, password: str) -> bool:
         """Validates a given user's credentials and indicates if it is valid
 
@@ -78,9 +275,12 @@ database.
                 return False
         except NoResultFound:
             return False
-        if bcrypt.checkpw(password.encode(), user.hashed_password):
-            return True
-        return False
+        if not _check_password(password, user.hashed_password).result():
+            return False
+        if _needs_rehash(user.hashed_password):
+            self._db.update_user(user.id,
+                                 hashed_password=_hash_password(password))
+        return True
 
     def create_session(self, email: str) -> Union[str, None]:
         """Retrieves a session id of a given user's email attribute
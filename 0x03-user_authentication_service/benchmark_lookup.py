@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""This module houses a benchmark of the latency of DB.find_user_by,
+from a thousand to a million users.
+
+Usage: ./benchmark_lookup.py [size ...]
+
+The lookups on the indexed columns (email, session_id, reset_token)
+should stay flat as the table grows, while the one on hashed_password,
+which is not indexed, grows with it as a full table scan.
+"""
+import os
+import sys
+import tempfile
+import time
+from db import DB
+from user import User
+from typing import List
+
+
+SIZES = [1000, 10000, 100000, 1000000]
+LOOKUPS = 200
+CHUNK_SIZE = 10000
+
+
+def fill(db: DB, size: int) -> None:
+    """Inserts a given number of users, CHUNK_SIZE rows per transaction
+
+    Args:
+        db - the database to fill
+        size - the number of users to insert
+    """
+    insert = User.__table__.insert()
+    for start in range(0, size, CHUNK_SIZE):
+        rows = [{"email": "user{}@example.com".format(i),
+                 "hashed_password": "hash{}".format(i),
+                 "session_id": "session{}".format(i),
+                 "reset_token": "token{}".format(i)}
+                for i in range(start, min(start + CHUNK_SIZE, size))]
+        with db._engine.begin() as conn:
+            conn.execute(insert, rows)
+
+
+def time_lookups(db: DB, column: str, pattern: str, size: int) -> float:
+    """Times the lookups of users spread over the table
+
+    Args:
+        db - the database to query
+        column - the column to look the users up by
+        pattern - the format of the column's value of the i-th user
+        size - the number of users in the table
+
+    Returns:
+        the mean latency of a lookup, in microseconds
+    """
+    step = max(size // LOOKUPS, 1)
+    keys = [pattern.format(i) for i in range(0, size, step)]
+    start = time.perf_counter()
+    for key in keys:
+        db.find_user_by(**{column: key})
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main(sizes: List[int]) -> None:
+    """Prints the lookup latency of every column for each table size
+
+    Args:
+        sizes - the numbers of users to benchmark
+    """
+    columns = [("email", "user{}@example.com"),
+               ("session_id", "session{}"),
+               ("reset_token", "token{}"),
+               ("hashed_password", "hash{}")]
+    print("{:>9} ".format("users") +
+          " ".join("{:>16}".format(c) for c, _ in columns) + "  (us)")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for size in sizes:
+            db = DB("sqlite:///{}.db".format(size), reset=True)
+            fill(db, size)
+            latencies = [time_lookups(db, column, pattern, size)
+                         for column, pattern in columns]
+            print("{:>9} ".format(size) +
+                  " ".join("{:>16.1f}".format(t) for t in latencies))
+            db._session.close()
+            db._engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
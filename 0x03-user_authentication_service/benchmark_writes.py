@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""This module houses a benchmark of the write throughput of
+DB.add_user and DB.update_user under each SQLite performance profile.
+
+Usage: ./benchmark_writes.py [count]
+
+Each write is its own transaction, as in the service, so the figures
+mostly reflect what each profile pays to make a commit durable.
+"""
+import os
+import sys
+import tempfile
+import time
+from db import DB, SQLITE_PROFILES
+
+
+COUNT = 2000
+
+
+def writes_per_second(profile: str, count: int) -> tuple:
+    """Times count calls to add_user, then to update_user
+
+    Args:
+        profile - the name of the SQLite profile to benchmark
+        count - the number of users to add and update
+
+    Returns:
+        the numbers of add_user and update_user calls per second
+    """
+    db = DB("sqlite:///{}.db".format(profile), reset=True, profile=profile)
+    start = time.perf_counter()
+    ids = [db.add_user("user{}@example.com".format(i), "hash{}".format(i)).id
+           for i in range(count)]
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    for i, user_id in enumerate(ids):
+        db.update_user(user_id, session_id="session{}".format(i))
+    updated = time.perf_counter() - start
+    db.close_session()
+    db._engine.dispose()
+    return count / added, count / updated
+
+
+def main(count: int) -> None:
+    """Prints the write throughput of every profile
+
+    Args:
+        count - the number of users to add and update per profile
+    """
+    print("{:>9} {:>12} {:>12}  (writes/s)".format(
+        "profile", "add_user", "update_user"))
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        for profile in SQLITE_PROFILES:
+            added, updated = writes_per_second(profile, count)
+            print("{:>9} {:>12.0f} {:>12.0f}".format(profile, added, updated))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else COUNT)
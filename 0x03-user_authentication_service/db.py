@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """This module houses the implementation of the DB class"""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import (
     sessionmaker,
@@ -8,42 +11,247 @@ from sqlalchemy.orm import (
 )
 from sqlalchemy.orm.session import Session
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 
 from user import Base, User
 from typing import (
     Union,
     List,
     Dict,
-    Any
+    Any,
+    Iterable,
+    Set,
+    Tuple
 )
+from itertools import islice
 import bcrypt
+import os
+
+
+DEFAULT_DB_URL = "sqlite:///a.db"
+# rows per transaction of DB.add_users, kept under SQLite's limit of
+# bound parameters for the lookup of the existing emails
+BULK_CHUNK_SIZE = 500
+# PRAGMAs run on every new SQLite connection, selected by DB_SQLITE_PROFILE:
+# "durable" syncs every commit to disk, "balanced" only the WAL
+# checkpoints (a power loss may drop the last commits, never corrupt the
+# file), and "fast" leaves syncing to the OS altogether
+SQLITE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "durable": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT"
+    },
+    "balanced": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY"
+    },
+    "fast": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY"
+    }
+}
+
+
+def migrate_schema(engine: Engine) -> List[str]:
+    """Brings the tables of an existing database up to date with the
+    models: create_all() skips the tables that already exist, so the
+    indexes declared since they were created are created here
+
+    Args:
+        engine - the engine of the database to migrate
+
+    Returns:
+        the names of the created indexes
+    """
+    inspector = inspect(engine)
+    # Inspector.has_table only exists from SQLAlchemy 1.4 onward
+    tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index['name']
+                    for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                # a unique index fails on duplicates, which must be
+                # resolved by hand before the migration can go through
+                index.create(engine)
+                created.append(index.name)
+    return created
+
+
+def verify_schema(engine: Engine) -> None:
+    """Checks that every table of the models exists with all its
+    columns, with one catalog query per table
+
+    Args:
+        engine - the engine of the database to check
+
+    Raises:
+        RuntimeError if a table or a column is missing
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            raise RuntimeError("Missing table {}".format(table.name))
+        existing = {column['name']
+                    for column in inspector.get_columns(table.name)}
+        missing = [c.name for c in table.columns if c.name not in existing]
+        if len(missing) > 0:
+            raise RuntimeError("Missing columns in {}: {}".format(
+                table.name, ", ".join(missing)))
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """Returns the options of create_engine for a given database URL
+
+    Args:
+        url - the URL of the database
+
+    Returns:
+        the keyword arguments of create_engine
+    """
+    url = make_url(url)
+    options: Dict[str, Any] = {"echo": False}
+    if url.get_backend_name() != "sqlite":
+        options["poolclass"] = QueuePool
+    elif url.database in (None, "", ":memory:"):
+        # an in-memory database lives and dies with its connection
+        options["poolclass"] = StaticPool
+        options["connect_args"] = {'check_same_thread': False}
+        return options
+    else:
+        # pooled connections move between threads, hence
+        # check_same_thread; each is only used by one thread at a time
+        options["poolclass"] = QueuePool
+        options["connect_args"] = {'check_same_thread': False}
+    options["pool_size"] = int(os.getenv('DB_POOL_SIZE', 5))
+    options["max_overflow"] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    options["pool_timeout"] = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    return options
+
+
+def apply_sqlite_profile(engine: Engine,
+                         profile: Union[str, Dict[str, Any]]) -> None:
+    """Runs the PRAGMAs of a performance profile on every connection
+    the engine opens from now on
+
+    Args:
+        engine - the engine of a SQLite database
+        profile - the name of a preset of SQLITE_PROFILES, or a
+        dictionary of PRAGMA names and values
+    """
+    if isinstance(profile, str):
+        if profile not in SQLITE_PROFILES:
+            raise ValueError("Unknown SQLite profile {}".format(profile))
+        profile = SQLITE_PROFILES[profile]
+    pragmas = ["PRAGMA {}={}".format(k, v) for k, v in profile.items()]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        """Runs the PRAGMAs of the profile on a new connection"""
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
 
 
 class DB:
     """DB class
     """
 
-    def __init__(self) -> None:
-        """Initialize a new DB instance
+    def __init__(self, url: Union[str, None] = None,
+                 reset: Union[bool, None] = None,
+                 profile: Union[str, Dict[str, Any], None] = None) -> None:
+        """Initialize a new DB instance, whose connection pool is sized
+        by the DB_POOL_SIZE, DB_MAX_OVERFLOW and DB_POOL_TIMEOUT variables.
+        The users persist across restarts: only the missing tables and
+        indexes are created, then the schema is checked
+
+        Args:
+            url - the URL of the database, DB_URL or sqlite:///a.db
+            by default
+            reset - for tests only: drops every table first, so that the
+            database starts empty; DB_RESET=1 by default
+            profile - the SQLite performance profile, see
+            apply_sqlite_profile; DB_SQLITE_PROFILE or "balanced" by default
         """
-        self._engine = create_engine("sqlite:///a.db",
-                                     echo=False,
-                                     connect_args={
-                                        'check_same_thread': False}
-                                     )
-        Base.metadata.drop_all(self._engine)
+        if url is None:
+            url = os.getenv('DB_URL', DEFAULT_DB_URL)
+        if reset is None:
+            reset = os.getenv('DB_RESET') == '1'
+        self._engine = create_engine(url, **_engine_options(url))
+        if self._engine.dialect.name == "sqlite":
+            if profile is None:
+                profile = os.getenv('DB_SQLITE_PROFILE', "balanced")
+            apply_sqlite_profile(self._engine, profile)
+        if reset:
+            Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session: Union[Session, None] = None
+        verify_schema(self._engine)
+        migrate_schema(self._engine)
+        self._sessions = scoped_session(sessionmaker(bind=self._engine))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session of the current thread, created on first use and
+        kept until close_session() is called
         """
-        if self.__session is None:
-            DBSession = scoped_session(sessionmaker(bind=self._engine))
-            self.__session = DBSession()
-        return self.__session
+        return self._sessions()
+
+    def close_session(self, exception: Union[BaseException, None] = None
+                      ) -> None:
+        """Closes the session of the current thread, giving its
+        connection back to the pool
+
+        Args:
+            exception - the exception that ended the request, if any,
+            as passed by Flask's teardown_appcontext
+        """
+        self._sessions.remove()
+
+    def init_app(self, app: Any) -> None:
+        """Ties the sessions to the app contexts of a Flask application,
+        so that each request starts with a fresh session and ends by
+        releasing it
+
+        Args:
+            app - the Flask application
+        """
+        app.teardown_appcontext(self.close_session)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Returns figures about the connection pool, for monitoring
+
+        Returns:
+            a dictionary of the configured pool size, and of the numbers
+            of idle connections, of connections in use and of connections
+            opened beyond the pool size; for a pool without those figures,
+            such as the StaticPool of an in-memory database, its status
+        """
+        pool = self._engine.pool
+        if not isinstance(pool, QueuePool):
+            return {"status": pool.status()}
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0)
+        }
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Adds a user object to the database"""
@@ -55,6 +263,78 @@ class DB:
             self._session.rollback()
         return user
 
+    def existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """Finds which of the given emails already belong to a user,
+        in a single query
+
+        Args:
+            emails - the emails to look up, at most BULK_CHUNK_SIZE
+
+        Returns:
+            the set of the emails already taken
+        """
+        rows = self._session.query(User.email).filter(
+            User.email.in_(list(emails)))
+        return {email for email, in rows}
+
+    def add_users(self, users: Iterable[Tuple[str, Any]],
+                  chunk_size: int = BULK_CHUNK_SIZE) -> List[str]:
+        """Adds many users, with one bulk insert and one transaction per
+        chunk of chunk_size users, reading the iterable lazily
+
+        Args:
+            users - the (email, hashed_password) pairs of the users
+            chunk_size - the number of users inserted per transaction
+
+        Returns:
+            the emails that were not added, because they already belonged
+            to a user or came earlier in users
+        """
+        conflicts = []
+        users = iter(users)
+        while True:
+            chunk = list(islice(users, chunk_size))
+            if len(chunk) == 0:
+                return conflicts
+            taken = self.existing_emails(email for email, _ in chunk)
+            rows = []
+            for email, hashed_password in chunk:
+                if email in taken:
+                    conflicts.append(email)
+                    continue
+                taken.add(email)
+                rows.append({"email": email,
+                             "hashed_password": hashed_password})
+            if len(rows) == 0:
+                continue
+            try:
+                self._session.execute(User.__table__.insert(), rows)
+                self._session.commit()
+            except IntegrityError:
+                # another writer took some of the emails in the meantime:
+                # insert the chunk row by row to tell them apart
+                self._session.rollback()
+                conflicts += self._add_rows_one_by_one(rows)
+
+    def _add_rows_one_by_one(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """Inserts rows one by one, in a single transaction
+
+        Args:
+            rows - the columns of the users to insert
+
+        Returns:
+            the emails of the rows that conflicted with an existing user
+        """
+        conflicts = []
+        for row in rows:
+            try:
+                with self._session.begin_nested():
+                    self._session.execute(User.__table__.insert(), row)
+            except IntegrityError:
+                conflicts.append(row["email"])
+        self._session.commit()
+        return conflicts
+
     def find_user_by(self, *args: List, **kwargs: Any) -> User:
         """Finds a given user based a given keyword argument(s)
 